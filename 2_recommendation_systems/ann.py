@@ -0,0 +1,266 @@
+"""
+Nearest neighbor indices for the item recommender
+
+Both indices return neighbors by dot product, which is the cosine similarity for the
+unit length movie vectors of the recommender.
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+from typing import Tuple
+
+
+class BruteForceIndex:
+    """
+    Exact search by comparing every query with every vector
+    """
+
+    kind = "brute"
+
+    def __init__(self, block_size: int = 1024):
+        self.block_size = block_size
+        self.vectors = None
+
+    def build(self, vectors) -> "BruteForceIndex":
+        self.vectors = csr_matrix(vectors, dtype=np.float64)
+        return self
+
+    def update(self, vectors, changed: np.ndarray) -> "BruteForceIndex":
+        """
+        Replace the vectors after the given rows changed, nothing is precomputed
+        """
+        return self.build(vectors)
+
+    def query(self, queries, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top k vectors for every query sorted by descending similarity
+        """
+        queries = csr_matrix(queries, dtype=np.float64)
+        k = min(k, self.vectors.shape[0])
+        idx = np.empty((queries.shape[0], k), dtype=np.int64)
+        sims = np.empty((queries.shape[0], k))
+        for start in range(0, queries.shape[0], self.block_size):
+            block = slice(start, start + self.block_size)
+            block_sims = (queries[block] @ self.vectors.T).toarray()
+            idx[block], sims[block] = _top_k(block_sims, k)
+        return idx, sims
+
+    def save(self, path: str) -> None:
+        np.savez(path, kind=self.kind, block_size=self.block_size, **_save_csr(self.vectors))
+
+    @classmethod
+    def _from_file(cls, data) -> "BruteForceIndex":
+        index = cls(block_size=int(data["block_size"]))
+        index.vectors = _load_csr(data)
+        return index
+
+
+class RandomProjectionLSH:
+    """
+    Approximate search by locality sensitive hashing with random hyperplanes
+
+    Each of the n_tables hash tables assigns every vector a code of n_bits sign bits of
+    random projections. Candidates are the vectors sharing a bucket with the query in any
+    table, they are reranked by their exact similarity. More tables and probes raise the
+    recall, more bits make the buckets smaller and the queries faster.
+
+    n_probes: number of additional buckets per table, reached by flipping the bits whose
+    projections are closest to zero
+    batch_size: number of queries searched at once, each batch is held as dense matrix
+    """
+
+    kind = "lsh"
+
+    def __init__(
+        self,
+        n_tables: int = 8,
+        n_bits: int = 10,
+        n_probes: int = 0,
+        batch_size: int = 128,
+        seed: int = 42,
+    ):
+        if not 0 < n_bits < 63:
+            raise ValueError("n_bits must be between 1 and 62")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = min(n_probes, n_bits)
+        self.batch_size = batch_size
+        self.seed = seed
+        self.vectors = None
+
+    def build(self, vectors) -> "RandomProjectionLSH":
+        self.vectors = csr_matrix(vectors, dtype=np.float64)
+        rng = np.random.default_rng(self.seed)
+        self.planes = rng.standard_normal(
+            (self.n_tables * self.n_bits, self.vectors.shape[1])
+        )
+
+        codes, _ = self._hash(self.vectors)
+        # buckets are the runs of equal codes in the sorted code array of a table
+        self.order = np.argsort(codes, axis=0, kind="stable").T
+        self.codes = np.take_along_axis(codes.T, self.order, axis=1)
+        return self
+
+    def update(self, vectors, changed: np.ndarray) -> "RandomProjectionLSH":
+        """
+        Replace the vectors after the given rows changed and re-hash only those rows.
+        New columns get new random plane components, they are zero in the other rows
+        so the codes of those stay valid.
+        """
+        self.vectors = csr_matrix(vectors, dtype=np.float64)
+        n_new = self.vectors.shape[1] - self.planes.shape[1]
+        if n_new > 0:
+            rng = np.random.default_rng([self.seed, self.planes.shape[1]])
+            extra = rng.standard_normal((self.planes.shape[0], n_new))
+            self.planes = np.hstack([self.planes, extra])
+
+        changed = np.unique(changed)
+        codes, _ = self._hash(self.vectors[changed])
+        order = np.empty((self.n_tables, self.order.shape[1]), dtype=self.order.dtype)
+        sorted_codes = np.empty_like(self.codes)
+        for t in range(self.n_tables):
+            # take the changed rows out of the sorted arrays and insert them again
+            keep = ~np.isin(self.order[t], changed)
+            new = np.argsort(codes[:, t], kind="stable")
+            pos = np.searchsorted(self.codes[t][keep], codes[new, t], "right")
+            order[t] = np.insert(self.order[t][keep], pos, changed[new])
+            sorted_codes[t] = np.insert(self.codes[t][keep], pos, codes[new, t])
+        self.order, self.codes = order, sorted_codes
+        return self
+
+    def query(self, queries, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top k vectors for every query sorted by descending similarity,
+        padded with -1 and -inf if fewer than k candidates were found
+        """
+        queries = csr_matrix(queries, dtype=np.float64)
+        k = min(k, self.vectors.shape[0])
+        idx = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        sims = np.full((queries.shape[0], k), -np.inf)
+        for start in range(0, queries.shape[0], self.batch_size):
+            block = slice(start, start + self.batch_size)
+            idx[block], sims[block] = self._query_batch(queries[block], k)
+        return idx, sims
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            kind=self.kind,
+            params=[self.n_tables, self.n_bits, self.n_probes, self.batch_size, self.seed],
+            planes=self.planes,
+            codes=self.codes,
+            order=self.order,
+            **_save_csr(self.vectors),
+        )
+
+    @classmethod
+    def _from_file(cls, data) -> "RandomProjectionLSH":
+        index = cls(*data["params"].tolist())
+        index.planes = data["planes"]
+        index.codes = data["codes"]
+        index.order = data["order"]
+        index.vectors = _load_csr(data)
+        return index
+
+    def _hash(self, vectors: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hash codes with shape (vectors, tables) and the projections they are made of
+        """
+        proj = np.asarray(vectors @ self.planes.T).reshape(-1, self.n_tables, self.n_bits)
+        weights = np.left_shift(1, np.arange(self.n_bits, dtype=np.int64))
+        codes = (proj > 0).astype(np.int64) @ weights
+        return codes, proj
+
+    def _query_batch(self, queries: csr_matrix, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        n_queries, n_items = queries.shape[0], self.vectors.shape[0]
+        codes, proj = self._hash(queries)
+
+        # probe the own bucket and the buckets of the least certain bits
+        probes = codes[:, :, None]
+        if self.n_probes:
+            flip_bits = np.argsort(np.abs(proj), axis=2)[:, :, : self.n_probes]
+            flipped = codes[:, :, None] ^ np.left_shift(1, flip_bits)
+            probes = np.concatenate([probes, flipped], axis=2)
+
+        # bucket ranges in the sorted code arrays, offset into the flattened order arrays
+        lo = np.empty(probes.shape, dtype=np.int64)
+        hi = np.empty(probes.shape, dtype=np.int64)
+        for t in range(self.n_tables):
+            lo[:, t] = np.searchsorted(self.codes[t], probes[:, t], "left") + t * n_items
+            hi[:, t] = np.searchsorted(self.codes[t], probes[:, t], "right") + t * n_items
+        lens = hi - lo
+
+        # expand all bucket ranges to (query, candidate) pairs without python loops
+        cands = self.order.ravel()[_expand_ranges(lo.ravel(), lens.ravel())]
+        query_ids = np.repeat(np.arange(n_queries), lens.reshape(n_queries, -1).sum(axis=1))
+
+        # drop duplicate candidates found in several tables, sorting only the pairs
+        pairs = np.unique(query_ids * n_items + cands)
+        query_ids, cands = pairs // n_items, pairs % n_items
+
+        # exact similarities of the pairs from the nonzeros of the candidate vectors
+        dense = queries.toarray()
+        nnz = np.diff(self.vectors.indptr)[cands]
+        pos = _expand_ranges(self.vectors.indptr[cands], nnz)
+        prods = self.vectors.data[pos] * dense[
+            np.repeat(query_ids, nnz), self.vectors.indices[pos]
+        ]
+        pair_ids = np.repeat(np.arange(len(cands)), nnz)
+        pair_sims = np.bincount(pair_ids, weights=prods, minlength=len(cands))
+
+        # keep the k most similar candidates of every query
+        order = np.lexsort((-pair_sims, query_ids))
+        query_ids, cands, pair_sims = query_ids[order], cands[order], pair_sims[order]
+        starts = np.searchsorted(query_ids, np.arange(n_queries))
+        rank = np.arange(len(query_ids)) - starts[query_ids]
+        keep = rank < k
+
+        idx = np.full((n_queries, k), -1, dtype=np.int64)
+        sims = np.full((n_queries, k), -np.inf)
+        idx[query_ids[keep], rank[keep]] = cands[keep]
+        sims[query_ids[keep], rank[keep]] = pair_sims[keep]
+        return idx, sims
+
+
+INDICES = {index.kind: index for index in (BruteForceIndex, RandomProjectionLSH)}
+
+
+def load_index(path: str):
+    """
+    Load an index stored with save
+    """
+    with np.load(path) as data:
+        return INDICES[str(data["kind"])]._from_file(data)
+
+
+def _expand_ranges(starts: np.ndarray, lens: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of the ranges [start, start + len) as one index array
+    """
+    offsets = np.repeat(starts - np.cumsum(lens) + lens, lens)
+    return offsets + np.arange(lens.sum())
+
+
+def _top_k(sims: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    rows = np.arange(sims.shape[0])[:, None]
+    if k < sims.shape[1]:
+        idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.tile(np.arange(sims.shape[1]), (sims.shape[0], 1))
+    order = np.argsort(-sims[rows, idx], axis=1, kind="stable")
+    idx = idx[rows, order]
+    return idx, sims[rows, idx]
+
+
+def _save_csr(mat: csr_matrix) -> dict:
+    return {
+        "data": mat.data,
+        "indices": mat.indices,
+        "indptr": mat.indptr,
+        "shape": np.array(mat.shape),
+    }
+
+
+def _load_csr(data) -> csr_matrix:
+    return csr_matrix(
+        (data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"])
+    )
@@ -0,0 +1,76 @@
+"""
+Throughput of single user and batch recommendations
+
+Uses data/user_reviews.csv if available, otherwise random clustered ratings of the given size.
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from recommender import ItemRecommender
+
+
+def load_recommender(n_users: int, n_items: int, density: float, n_neighbors: int):
+    path = os.path.join(os.path.dirname(__file__), "data", "user_reviews.csv")
+    if os.path.exists(path):
+        return ItemRecommender.from_reviews(pd.read_csv(path), n_neighbors=n_neighbors)
+
+    # users rate mostly movies of a few favorite clusters, so movies have real neighbors
+    rng = np.random.default_rng(42)
+    n_clusters = 200
+    item_clusters = rng.integers(0, n_clusters, n_items)
+    cluster_items = [np.flatnonzero(item_clusters == c) for c in range(n_clusters)]
+    n_rated = max(1, int(density * n_items))
+    rows, cols = [], []
+    for user in range(n_users):
+        favorites = rng.choice(n_clusters, 2, replace=False)
+        pool = np.concatenate([cluster_items[c] for c in favorites])
+        liked = rng.choice(pool, min(len(pool), int(0.9 * n_rated)), replace=False)
+        other = rng.integers(0, n_items, n_rated - len(liked))
+        cols.append(np.union1d(liked, other))
+        rows.append(np.full(len(cols[-1]), user))
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    ratings = csr_matrix(
+        (rng.integers(1, 6, len(rows)).astype(np.float64), (rows, cols)),
+        shape=(n_users, n_items),
+    )
+    titles = [f"movie {i}" for i in range(n_items)]
+    return ItemRecommender(ratings, titles, n_neighbors=n_neighbors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--density", type=float, default=0.02)
+    parser.add_argument("--neighbors", type=int, default=20)
+    parser.add_argument("-n", type=int, default=5, help="recommendations per user")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    recommender = load_recommender(args.users, args.items, args.density, args.neighbors)
+    build_time = time.perf_counter() - start_time
+    users = recommender.user_names
+    print(
+        f"Index for {recommender.ratings.shape[0]} users and {recommender.ratings.shape[1]} "
+        f"movies built in {round(build_time, 2)}sec"
+    )
+
+    start_time = time.perf_counter()
+    for user in users:
+        recommender.recommend(user, n=args.n)
+    single_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    recommender.recommend_batch(users, n=args.n)
+    batch_time = time.perf_counter() - start_time
+
+    print(f"Single: {round(len(users) / single_time)} users/sec")
+    print(f"Batch: {round(len(users) / batch_time)} users/sec")
+
+
+if __name__ == "__main__":
+    main()
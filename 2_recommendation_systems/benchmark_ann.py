@@ -0,0 +1,89 @@
+"""
+Recall@10 and queries per second of the approximate index compared to brute force search
+
+Uses data/user_reviews.csv if available, otherwise random clustered ratings of the given size.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from ann import BruteForceIndex, RandomProjectionLSH, load_index
+from benchmark import load_recommender
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, query_ids: np.ndarray) -> float:
+    """
+    Share of the true neighbors that were found, the query movie itself is not counted
+    """
+    hits = [
+        len(np.setdiff1d(np.intersect1d(f, t), q)) for f, t, q in zip(found, truth, query_ids)
+    ]
+    return np.sum(hits) / (truth.size - np.sum(truth == query_ids[:, None]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--density", type=float, default=0.005)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    # the recommender is only used to load the ratings and normalize the movie vectors
+    recommender = load_recommender(args.users, args.items, args.density, n_neighbors=1)
+    items = recommender.items
+    rng = np.random.default_rng(42)
+    query_ids = rng.choice(items.shape[0], min(args.queries, items.shape[0]), False)
+    queries = items[query_ids]
+    print(f"{items.shape[0]} movies, {queries.shape[0]} queries, k={args.k}")
+
+    def report(name, build_time, query_time, recall):
+        print(
+            f"{name:<36} build {build_time:6.2f}sec  "
+            f"{queries.shape[0] / query_time:8.0f} queries/sec  recall@{args.k} {recall:.3f}"
+        )
+
+    # previous search of the notebook
+    start_time = time.perf_counter()
+    model_knn = NearestNeighbors(metric="cosine", algorithm="brute", n_neighbors=args.k)
+    model_knn.fit(items)
+    build_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    model_knn.kneighbors(queries)
+    report("sklearn brute", build_time, time.perf_counter() - start_time, 1.0)
+
+    start_time = time.perf_counter()
+    brute = BruteForceIndex().build(items)
+    build_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    truth, _ = brute.query(queries, args.k)
+    report("BruteForceIndex", build_time, time.perf_counter() - start_time, 1.0)
+
+    for n_tables, n_bits, n_probes in [(8, 12, 0), (8, 10, 2), (16, 8, 0), (32, 10, 2)]:
+        start_time = time.perf_counter()
+        lsh = RandomProjectionLSH(n_tables=n_tables, n_bits=n_bits, n_probes=n_probes)
+        lsh.build(items)
+        build_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        found, _ = lsh.query(queries, args.k)
+        query_time = time.perf_counter() - start_time
+        name = f"LSH tables={n_tables} bits={n_bits} probes={n_probes}"
+        report(name, build_time, query_time, recall_at_k(found, truth, query_ids))
+
+    # round trip of the last index through disk
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.npz")
+        lsh.save(path)
+        start_time = time.perf_counter()
+        loaded = load_index(path)
+        load_time = time.perf_counter() - start_time
+        assert np.array_equal(loaded.query(queries, args.k)[0], found)
+        print(f"Saved index: {os.path.getsize(path) / 1e6:.1f}MB, loaded in {load_time:.3f}sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Item based movie recommender with a precomputed cosine neighbor index
+"""
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, diags
+from typing import Iterable, List, Tuple, Union
+
+from ann import BruteForceIndex
+
+
+class ItemRecommender:
+    def __init__(
+        self,
+        ratings: Union[csr_matrix, np.ndarray],
+        item_titles: Iterable[str],
+        user_names: Iterable[str] = None,
+        n_neighbors: int = 10,
+        block_size: int = 1024,
+        index=None,
+    ):
+        """
+        ratings: user-movie matrix with users as rows and movies as columns, 0 means not rated
+        n_neighbors: number of most similar movies stored per movie
+        block_size: number of movies whose neighbors are searched at once
+        index: nearest neighbor index from ann.py, exact brute force search by default
+        """
+        self.ratings = csr_matrix(ratings, dtype=np.float64)
+        self.ratings.eliminate_zeros()
+        self.item_titles = np.asarray(list(item_titles), dtype=object)
+        self.item_ids = {title: i for i, title in enumerate(self.item_titles)}
+        if user_names is None:
+            user_names = range(self.ratings.shape[0])
+        self.user_names = list(user_names)
+        self.user_ids = {name: i for i, name in enumerate(self.user_names)}
+        self.n_neighbors = min(n_neighbors, self.ratings.shape[1] - 1)
+        self.block_size = block_size
+        self.index = index if index is not None else BruteForceIndex(block_size)
+
+        self._build_index()
+
+    @classmethod
+    def from_reviews(cls, df_user: pd.DataFrame, **kwargs) -> "ItemRecommender":
+        """
+        Create recommender from the user_reviews.csv data frame with one row per user
+        """
+        user_names = df_user["User"]
+        df_user = df_user.drop(["Unnamed: 0", "User"], axis=1, errors="ignore")
+        return cls(df_user.to_numpy(), df_user.columns, user_names=user_names, **kwargs)
+
+    def similar_items(self, title: str, n: int = None) -> List[Tuple[str, float]]:
+        """
+        Most similar movies for the given movie title
+        """
+        idx = self.item_ids[title]
+        found = self.neighbors[idx] >= 0
+        n = n or self.n_neighbors
+        return list(
+            zip(
+                self.item_titles[self.neighbors[idx][found][:n]],
+                self.similarities[idx][found][:n].tolist(),
+            )
+        )
+
+    def favorite_item(self, user: str) -> Union[int, None]:
+        """
+        Index of the highest rated movie of the user
+        """
+        row = self.ratings[self.user_ids[user]]
+        if row.nnz == 0:
+            return None
+        return row.indices[np.argmax(row.data)]
+
+    def recommend(self, user: str, n: int = 5) -> List[Tuple[str, float]]:
+        """
+        Recommend movies similar to the favorite movie of the user which the user
+        has not rated yet
+        """
+        fav = self.favorite_item(user)
+        if fav is None:
+            return []
+
+        # the indices of a csr row are sorted, so rated movies are found by binary search
+        rated = self.ratings[self.user_ids[user]].indices
+        candidates = self.neighbors[fav]
+        pos = np.minimum(np.searchsorted(rated, candidates), len(rated) - 1)
+        unrated = (rated[pos] != candidates) & (candidates >= 0)
+
+        idx = candidates[unrated][:n]
+        sims = self.similarities[fav][unrated][:n]
+        return list(zip(self.item_titles[idx], sims.tolist()))
+
+    def recommend_batch(
+        self, users: Iterable[str], n: int = 5
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Recommend movies for many users at once
+
+        Returns the movie indices and similarities with one row per user. Rows are padded
+        with -1 and nan if fewer than n unrated neighbors are left, users without any
+        ratings get an empty row.
+        """
+        uids = np.array([self.user_ids[user] for user in users], dtype=np.int64)
+        user_ratings = self.ratings[uids]
+
+        # favorite movie of every user in one pass over the sparse rows
+        favs = np.asarray(user_ratings.argmax(axis=1)).ravel()
+        has_ratings = user_ratings.getnnz(axis=1) > 0
+
+        candidates = self.neighbors[favs]
+        sims = self.similarities[favs]
+
+        # sparse lookup of the candidates in the rating rows of the users
+        rows = np.arange(len(uids))[:, None]
+        rated = user_ratings[rows, candidates].toarray() != 0
+        rated[~has_ratings] = True
+        rated[candidates < 0] = True
+
+        # stable sort moves the unrated candidates to the front in similarity order
+        order = np.argsort(rated, axis=1, kind="stable")[:, :n]
+        keep = ~rated[rows, order]
+        idx = np.where(keep, candidates[rows, order], -1)
+        sims = np.where(keep, sims[rows, order], np.nan)
+        return idx, sims
+
+    def add_ratings(
+        self,
+        users: Iterable[str],
+        titles: Iterable[str],
+        ratings: Iterable[float],
+    ) -> None:
+        """
+        Add or overwrite ratings and update only the neighbor lists affected by them
+        """
+        users = list(users)
+        # unknown users are appended as new rows
+        for user in users:
+            if user not in self.user_ids:
+                self.user_ids[user] = len(self.user_names)
+                self.user_names.append(user)
+        rows = np.array([self.user_ids[user] for user in users], dtype=np.int64)
+        cols = np.array([self.item_ids[title] for title in titles], dtype=np.int64)
+        values = np.asarray(list(ratings), dtype=np.float64)
+
+        # keep the last rating if a user rated a movie twice
+        n_items = self.ratings.shape[1]
+        _, last = np.unique((rows * n_items + cols)[::-1], return_index=True)
+        last = len(rows) - 1 - last
+        rows, cols, values = rows[last], cols[last], values[last]
+
+        shape = (len(self.user_names), n_items)
+        if shape != self.ratings.shape:
+            self.ratings.resize(shape)
+        old = np.asarray(self.ratings[rows, cols]).ravel()
+        delta = csr_matrix((values - old, (rows, cols)), shape=shape)
+        self.ratings = (self.ratings + delta).tocsr()
+        self.ratings.eliminate_zeros()
+
+        self._update_index(np.unique(cols))
+
+    def _build_index(self) -> None:
+        """
+        Precompute the top n cosine neighbors of every movie
+        """
+        self._normalize_items()
+        self.index.build(self.items)
+        n_items = self.ratings.shape[1]
+        self.neighbors = np.empty((n_items, self.n_neighbors), dtype=np.int64)
+        self.similarities = np.empty((n_items, self.n_neighbors))
+        for start in range(0, n_items, self.block_size):
+            block = np.arange(start, min(start + self.block_size, n_items))
+            self.neighbors[block], self.similarities[block] = self._top_neighbors(block)
+
+    def _update_index(self, changed: np.ndarray) -> None:
+        """
+        Recompute the neighbor lists of the changed movies and of all movies whose
+        list contains one of them or which got a changed movie as a closer neighbor
+        """
+        self._normalize_items()
+        self.index.update(self.items, changed)
+        sims = (self.items[changed] @ self.items.T).toarray()
+
+        contains = np.isin(self.neighbors, changed).any(axis=1)
+        # lists of approximate indices end in -inf padding, unrelated movies do not count
+        closer = ((sims.T > self.similarities[:, -1:]) & (sims.T > 0)).any(axis=1)
+        affected = np.union1d(changed, np.flatnonzero(contains | closer))
+
+        for start in range(0, len(affected), self.block_size):
+            block = affected[start : start + self.block_size]
+            self.neighbors[block], self.similarities[block] = self._top_neighbors(block)
+
+    def _normalize_items(self) -> None:
+        """
+        Movie vectors scaled to unit length, so dot products are cosine similarities
+        """
+        items = self.ratings.T.tocsr()
+        norms = np.sqrt(np.asarray(items.multiply(items).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        self.items = (diags(1 / norms) @ items).tocsr()
+
+    def _top_neighbors(self, block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top n neighbors of the given movies sorted by descending similarity, approximate
+        indices pad them with -1
+        """
+        idx, sims = self.index.query(self.items[block], self.n_neighbors + 1)
+
+        # a movie is not its own neighbor, drop the last one if it was not found
+        is_self = idx == block[:, None]
+        is_self[~is_self.any(axis=1), -1] = True
+        shape = (len(block), self.n_neighbors)
+        return idx[~is_self].reshape(shape), sims[~is_self].reshape(shape)
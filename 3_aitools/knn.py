@@ -0,0 +1,151 @@
+"""
+K nearest neighbors classifier for the air pollution data
+"""
+import numpy as np
+from typing import Dict, Iterable, Tuple
+from scipy.spatial import cKDTree
+
+
+class KNN:
+    def __init__(
+        self,
+        X: np.ndarray,
+        Y: np.ndarray,
+        k: int = 10,
+        index: str = "brute",
+        leaf_size: int = 40,
+        batch_size: int = 1024,
+    ):
+        """
+        index: "brute" computes distances with matrix operations, "kdtree" builds a KD-tree
+        which is faster for larger city datasets with few features
+        """
+        self.X = np.asarray(X, dtype=np.float64)
+        self.Y = np.asarray(Y)
+        self.k = k
+        self.batch_size = batch_size
+
+        # classes are encoded as indices so votes can be counted with bincount
+        self.classes, self.Y_idx = np.unique(self.Y, return_inverse=True)
+
+        if index == "brute":
+            self.tree = None
+            self.X_sq = np.einsum("ij,ij->i", self.X, self.X)
+        elif index == "kdtree":
+            self.tree = cKDTree(self.X, leafsize=leaf_size)
+        else:
+            raise ValueError("Invalid index")
+
+    def kneighbors(self, X: np.ndarray, k: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest training rows for every row in X, sorted by ascending distance
+        """
+        k = min(k or self.k, self.X.shape[0])
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+
+        if self.tree is not None:
+            dist, idx = self.tree.query(X, k=k)
+            return dist.reshape(X.shape[0], k), idx.reshape(X.shape[0], k)
+
+        dist = np.empty((X.shape[0], k))
+        idx = np.empty((X.shape[0], k), dtype=np.int64)
+        # batch the queries so the distance matrix fits into memory
+        for start in range(0, X.shape[0], self.batch_size):
+            batch = X[start : start + self.batch_size]
+            dist[start : start + len(batch)], idx[start : start + len(batch)] = (
+                self._kneighbors_brute(batch, k)
+            )
+        return dist, idx
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predict classes for all rows in X
+        """
+        _, idx = self.kneighbors(X)
+        return self._vote(idx)
+
+    def score(self, X: np.ndarray, Y: np.ndarray) -> float:
+        """
+        Calculate accuracy for given data set
+        """
+        predictions = self.predict(X)
+        return np.sum(np.equal(predictions, Y)) / Y.shape[0]
+
+    def score_k_values(
+        self,
+        k_vals: Iterable[int],
+        X: np.ndarray,
+        Y: np.ndarray,
+        leave_one_out: bool = False,
+    ) -> Dict[int, float]:
+        """
+        Calculate accuracy for several k values from a single neighbor search.
+        leave_one_out: X are the training rows, every row is not its own neighbor
+        """
+        k_vals = list(k_vals)
+        k_max = max(k_vals)
+        _, idx = self.kneighbors(X, k=k_max + 1 if leave_one_out else k_max)
+
+        if leave_one_out:
+            # drop the row itself, or the last neighbor if duplicates pushed it out
+            is_self = idx == np.arange(idx.shape[0])[:, None]
+            is_self[~is_self.any(axis=1), -1] = True
+            idx = idx[~is_self].reshape(idx.shape[0], -1)
+
+        # running vote counts per class over the sorted neighbor list
+        one_hot = np.eye(len(self.classes), dtype=np.int32)[self.Y_idx[idx]]
+        votes = np.cumsum(one_hot, axis=1)
+
+        results = {}
+        for k in k_vals:
+            predictions = self._pick_max(votes[:, min(k, idx.shape[1]) - 1])
+            results[k] = np.sum(np.equal(predictions, Y)) / Y.shape[0]
+        return results
+
+    def _kneighbors_brute(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Squared euclidian distances by ||x||^2 - 2xy + ||y||^2 and top k by argpartition
+        """
+        sq_dist = (
+            np.einsum("ij,ij->i", X, X)[:, None] - 2 * X @ self.X.T + self.X_sq[None, :]
+        )
+        np.maximum(sq_dist, 0, out=sq_dist)
+
+        rows = np.arange(X.shape[0])[:, None]
+        if k < self.X.shape[0]:
+            idx = np.argpartition(sq_dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(self.X.shape[0]), (X.shape[0], 1))
+        # only the k candidates have to be sorted
+        order = np.argsort(sq_dist[rows, idx], axis=1, kind="stable")
+        idx = idx[rows, order]
+        return np.sqrt(sq_dist[rows, idx]), idx
+
+    def _vote(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Majority vote of the neighbor classes
+        """
+        votes = np.zeros((idx.shape[0], len(self.classes)), dtype=np.int32)
+        np.add.at(votes, (np.arange(idx.shape[0])[:, None], self.Y_idx[idx]), 1)
+        return self._pick_max(votes)
+
+    def _pick_max(self, votes: np.ndarray) -> np.ndarray:
+        """
+        Pick class with most votes, ties go to the higher class
+        """
+        n_classes = votes.shape[1]
+        return self.classes[n_classes - 1 - np.argmax(votes[:, ::-1], axis=1)]
+
+
+def cross_validation(
+    k_vals: Iterable[int],
+    X_train: np.ndarray,
+    Y_train: np.ndarray,
+    index: str = "brute",
+) -> Dict[int, float]:
+    """
+    Cross validate different k values to find the optimal one with the highest accuracy,
+    every training row is classified by its neighbors without itself (leave one out)
+    """
+    knn = KNN(X_train, Y_train, index=index)
+    return knn.score_k_values(k_vals, X_train, Y_train, leave_one_out=True)
@@ -0,0 +1,175 @@
+"""
+Streaming reader for the europarl corpora
+
+Sentences are read lazily line by line and their words are interned to integer ids in
+a single pass. The encoded corpus is cached as token id and sentence offset arrays plus
+the vocabulary, later runs memory-map the arrays instead of tokenizing the text again.
+"""
+import os
+import numpy as np
+from array import array
+from typing import Iterable, Iterator, List, Tuple
+
+PUNCTUATION = {".", ",", "!", "?", ":", ";"}
+NULL = "NULL"
+
+
+class Vocabulary:
+    """
+    Maps words to consecutive integer ids
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        self.words = []
+        self.ids = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> int:
+        if word not in self.ids:
+            self.ids[word] = len(self.words)
+            self.words.append(word)
+        return self.ids[word]
+
+    def encode(self, words: Iterable[str]) -> np.ndarray:
+        return np.array([self.add(word) for word in words], dtype=np.int32)
+
+    def decode(self, ids: Iterable[int]) -> List[str]:
+        return [self.words[i] for i in ids]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.ids
+
+    def __getitem__(self, word: str) -> int:
+        return self.ids[word]
+
+
+class Corpus:
+    """
+    Sentences as one flat array of word ids, sentence i is tokens[offsets[i]:offsets[i + 1]]
+    """
+
+    def __init__(self, tokens: np.ndarray, offsets: np.ndarray, vocab: Vocabulary):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.vocab = vocab
+        self._counts = None
+
+    @classmethod
+    def from_sentences(
+        cls, sentences: Iterable[List[str]], vocab: Vocabulary = None
+    ) -> "Corpus":
+        """
+        Intern the words of all sentences in one pass
+        """
+        vocab = vocab if vocab is not None else Vocabulary([NULL])
+        ids, add = vocab.ids, vocab.add
+        tokens = array("i")
+        offsets = array("q", [0])
+        for sentence in sentences:
+            tokens.extend([ids[word] if word in ids else add(word) for word in sentence])
+            offsets.append(len(tokens))
+        return cls(
+            np.frombuffer(tokens, dtype=np.int32), np.frombuffer(offsets, dtype=np.int64), vocab
+        )
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """
+        Number of occurrences of every word id
+        """
+        if self._counts is None:
+            self._counts = np.bincount(self.tokens, minlength=len(self.vocab))
+        return self._counts
+
+    def count(self, word: str) -> int:
+        return int(self.counts[self.vocab[word]]) if word in self.vocab else 0
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        best = np.argsort(-self.counts, kind="stable")[:n]
+        return list(zip(self.vocab.decode(best), self.counts[best].tolist()))
+
+    def sentence(self, i: int) -> List[str]:
+        return self.vocab.decode(self.tokens[self.offsets[i] : self.offsets[i + 1]])
+
+    def sentences(self) -> Iterator[np.ndarray]:
+        for i in range(len(self)):
+            yield self.tokens[self.offsets[i] : self.offsets[i + 1]]
+
+    def save(self, prefix: str) -> None:
+        """
+        Store as prefix.tokens.npy, prefix.offsets.npy and prefix.vocab.txt
+        """
+        # the arrays may be memory-mapped from the files they replace
+        save_array(f"{prefix}.tokens.npy", self.tokens)
+        save_array(f"{prefix}.offsets.npy", self.offsets)
+        with open(f"{prefix}.vocab.txt", "w") as f:
+            f.writelines(f"{word}\n" for word in self.vocab.words)
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "Corpus":
+        mmap_mode = "r" if mmap else None
+        with open(f"{prefix}.vocab.txt", "r") as f:
+            vocab = Vocabulary(line.rstrip("\n") for line in f)
+        return cls(
+            np.load(f"{prefix}.tokens.npy", mmap_mode=mmap_mode),
+            np.load(f"{prefix}.offsets.npy", mmap_mode=mmap_mode),
+            vocab,
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+def save_array(path: str, arr: np.ndarray) -> None:
+    """
+    np.save through a temporary file, so overwriting the file an array is memory-mapped
+    from does not truncate it while it is read
+    """
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, arr)
+    os.replace(tmp_path, path)
+
+
+def tokenize(line: str) -> List[str]:
+    return [word for word in line.split() if word not in PUNCTUATION]
+
+
+def read_sentences(filepath: str) -> Iterator[List[str]]:
+    """
+    Lazily yield the tokenized sentences of a file
+    """
+    with open(filepath, "r") as f:
+        for line in f:
+            yield tokenize(line)
+
+
+def read_corpus(filepath: str, vocab: Vocabulary = None) -> Corpus:
+    return Corpus.from_sentences(read_sentences(filepath), vocab)
+
+
+def load_corpus(filepath: str, cache_dir: str = None) -> Corpus:
+    """
+    Load the encoded corpus of a text file from the cache, encode and cache it if the
+    cache is missing or older than the text file
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(filepath), "cache")
+    prefix = os.path.join(cache_dir, os.path.basename(filepath))
+
+    cache_files = [f"{prefix}.tokens.npy", f"{prefix}.offsets.npy", f"{prefix}.vocab.txt"]
+    if all(os.path.exists(path) for path in cache_files):
+        cache_time = min(os.path.getmtime(path) for path in cache_files)
+        if cache_time >= os.path.getmtime(filepath):
+            return Corpus.load(prefix)
+
+    corpus = read_corpus(filepath)
+    os.makedirs(cache_dir, exist_ok=True)
+    corpus.save(prefix)
+    return corpus
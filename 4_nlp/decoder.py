@@ -0,0 +1,195 @@
+"""
+Word by word translation with the noisy channel model
+
+The best english translation E of a foreign sentence F maximizes P(E) P(F|E), with P(E)
+from the n-gram language model and P(F|E) from the IBM model 1 translation table. Every
+foreign word is translated to one english word in the same order.
+"""
+import time
+import numpy as np
+from typing import List, Tuple
+
+from corpus import Corpus, read_sentences
+from language_model import NGramLanguageModel
+from translation import IBMModel1
+
+
+class TranslationIndex:
+    """
+    Top k english candidates e of every foreign word f sorted by t(f|e), stored in CSR
+    form with one row per foreign word id
+    """
+
+    def __init__(self, model: IBMModel1, k: int = 10, include_null: bool = False):
+        e_ids = np.repeat(np.arange(len(model.e_vocab)), np.diff(model.indptr))
+        f_ids, probs = model.f_ids, model.probs
+        if not include_null:
+            keep = e_ids != 0
+            e_ids, f_ids, probs = e_ids[keep], f_ids[keep], probs[keep]
+
+        # sort by foreign word and descending probability, keep the first k of each word
+        order = np.lexsort((-probs, f_ids))
+        e_ids, f_ids, probs = e_ids[order], f_ids[order], probs[order]
+        starts = np.searchsorted(f_ids, f_ids, "left")
+        keep = np.arange(len(f_ids)) - starts < k
+
+        self.k = k
+        self.e_vocab, self.f_vocab = model.e_vocab, model.f_vocab
+        self.e_ids = e_ids[keep].astype(np.int32)
+        self.probs = probs[keep]
+        self.indptr = np.zeros(len(self.f_vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(f_ids[keep], minlength=len(self.f_vocab)), out=self.indptr[1:])
+
+    def candidates(self, f: str) -> List[Tuple[str, float]]:
+        if f not in self.f_vocab:
+            return []
+        row = slice(self.indptr[self.f_vocab[f]], self.indptr[self.f_vocab[f] + 1])
+        return list(zip(self.e_vocab.decode(self.e_ids[row]), self.probs[row].tolist()))
+
+    def candidate_matrix(self, f_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Candidates of many foreign word ids as (words, k) matrices of english ids and
+        translation probabilities, padded with -1 and 0. Unknown foreign words are -1.
+        """
+        known = f_ids >= 0
+        rows = np.where(known, f_ids, 0)
+        starts = self.indptr[rows]
+        lens = np.where(known, self.indptr[rows + 1] - starts, 0)
+        cols = np.arange(self.k)
+        valid = cols[None, :] < lens[:, None]
+        pos = np.where(valid, starts[:, None] + cols[None, :], 0)
+        return np.where(valid, self.e_ids[pos], -1), np.where(valid, self.probs[pos], 0.0)
+
+
+class Decoder:
+    """
+    Beam search over the translation candidates of all sentences at once, a beam size of
+    1 is greedy decoding
+    """
+
+    def __init__(
+        self,
+        index: TranslationIndex,
+        lm: NGramLanguageModel,
+        beam_size: int = 5,
+        lm_weight: float = 1.0,
+    ):
+        self.index = index
+        self.lm = lm
+        self.beam_size = beam_size
+        self.lm_weight = lm_weight
+        # english ids of the translation model mapped to ids of the language model
+        self.lm_ids = np.array(
+            [lm.vocab.ids.get(word, lm.unk) for word in index.e_vocab.words], dtype=np.int64
+        )
+
+    def translate(self, sentence: List[str]) -> List[str]:
+        return self.translate_batch([sentence])[0]
+
+    def translate_batch(self, sentences: List[List[str]]) -> List[List[str]]:
+        f_ids = [
+            [self.index.f_vocab.ids.get(word, -1) for word in sentence] for sentence in sentences
+        ]
+        corpus = Corpus(
+            np.array([i for ids in f_ids for i in ids], dtype=np.int64),
+            np.cumsum([0] + [len(ids) for ids in f_ids]),
+            self.index.f_vocab,
+        )
+        choices = self._search(corpus)
+
+        # english words, unknown foreign words are copied
+        return [
+            [
+                self.index.e_vocab.words[e] if e >= 0 else f
+                for e, f in zip(choices[i][: len(sentence)], sentence)
+            ]
+            for i, sentence in enumerate(sentences)
+        ]
+
+    def translate_file(
+        self, in_path: str, out_path: str = None, batch_size: int = 1000, verbose: bool = True
+    ) -> List[List[str]]:
+        """
+        Translate every line of a file, optionally write the translations to out_path
+        """
+        start_time = time.perf_counter()
+        sentences = list(read_sentences(in_path))
+        translations = []
+        for start in range(0, len(sentences), batch_size):
+            translations.extend(self.translate_batch(sentences[start : start + batch_size]))
+        seconds = time.perf_counter() - start_time
+
+        if out_path is not None:
+            with open(out_path, "w") as f:
+                f.writelines(" ".join(words) + "\n" for words in translations)
+        if verbose:
+            n_words = sum(len(sentence) for sentence in sentences)
+            print(
+                f"Translated {len(sentences)} sentences in {round(seconds, 2)}sec: "
+                f"{round(len(sentences) / seconds)} sentences/sec, "
+                f"{round(n_words / seconds)} words/sec"
+            )
+        return translations
+
+    def _search(self, corpus: Corpus) -> np.ndarray:
+        """
+        Returns the english id chosen for every foreign word, -1 for copied words, as
+        (sentences, max length) matrix
+        """
+        n, beam, hist = len(corpus), self.beam_size, self.lm.order - 1
+        lengths = corpus.lengths
+        max_len = int(lengths.max(initial=0))
+
+        scores = np.full((n, beam), -np.inf)
+        scores[:, 0] = 0.0
+        histories = np.full((n, beam, hist), self.lm.bos, dtype=np.int64)
+        parents = np.tile(np.arange(beam), (max_len, n, 1))
+        words = np.full((max_len, n, beam), -1, dtype=np.int64)
+
+        for j in range(max_len):
+            active = np.flatnonzero(lengths > j)
+            f_ids = corpus.tokens[corpus.offsets[active] + j]
+            e_ids, t_probs = self.index.candidate_matrix(f_ids)
+
+            # unknown words and words without candidates are copied and scored as unknown
+            no_candidates = e_ids[:, 0] < 0
+            t_probs[no_candidates, 0] = 1.0
+            k = e_ids.shape[1]
+            lm_words = np.where(e_ids >= 0, self.lm_ids[np.maximum(e_ids, 0)], self.lm.unk)
+
+            # score all (hypothesis, candidate) combinations of the active sentences
+            h = np.repeat(histories[active], k, axis=1).reshape(len(active) * beam * k, hist)
+            w = np.tile(lm_words, (1, beam)).ravel()
+            lm_scores = self.lm.log_prob_next(h, w).reshape(len(active), beam, k)
+            with np.errstate(divide="ignore"):
+                t_scores = np.log(t_probs)[:, None, :]
+            total = scores[active][:, :, None] + t_scores + self.lm_weight * lm_scores
+            total = total.reshape(len(active), beam * k)
+
+            # best beam hypotheses among beam * k expansions
+            best = np.argsort(-total, axis=1, kind="stable")[:, :beam]
+            rows = np.arange(len(active))[:, None]
+            parent, cand = best // k, best % k
+            scores[active] = total[rows, best]
+            parents[j, active] = parent
+            words[j, active] = e_ids[rows, cand]
+            if hist:
+                previous = histories[active][rows, parent][:, :, 1:]
+                histories[active] = np.concatenate(
+                    [previous, lm_words[rows, cand][:, :, None]], axis=2
+                )
+
+        # end of sentence probability
+        end = np.full(n * beam, self.lm.eos)
+        scores += self.lm_weight * self.lm.log_prob_next(
+            histories.reshape(n * beam, hist), end
+        ).reshape(n, beam)
+
+        # follow the back pointers of the best final hypothesis
+        choices = np.full((n, max_len), -1, dtype=np.int64)
+        b = np.argmax(scores, axis=1)
+        rows = np.arange(n)
+        for j in range(max_len - 1, -1, -1):
+            choices[:, j] = words[j, rows, b]
+            b = parents[j, rows, b]
+        return choices
@@ -0,0 +1,209 @@
+"""
+N-gram language model over the integer word ids of a corpus
+
+All n-grams up to the model order are counted in one pass into sorted key arrays, so
+probabilities of whole batches of sentences are looked up with binary searches.
+"""
+import numpy as np
+from typing import Iterable, List, Tuple
+
+from corpus import Corpus
+
+
+class NGramLanguageModel:
+    """
+    smoothing:
+      "interpolation" mixes the maximum likelihood estimates of all orders and a uniform
+                      distribution weighted by lambdas (uniform, unigram, bigram, ...),
+                      orders with unseen histories give their lambda to the others
+      "add_k"         adds k to every count of the highest order
+    """
+
+    def __init__(
+        self,
+        order: int = 2,
+        smoothing: str = "interpolation",
+        k: float = 1.0,
+        lambdas: Tuple[float, ...] = None,
+    ):
+        if order not in (1, 2, 3):
+            raise ValueError("Only unigram, bigram and trigram models are supported")
+        if smoothing not in ("interpolation", "add_k"):
+            raise ValueError(f"Invalid smoothing: {smoothing}")
+        if lambdas is None:
+            lambdas = {1: (0.01, 0.99), 2: (0.01, 0.29, 0.7), 3: (0.01, 0.09, 0.3, 0.6)}[order]
+        if len(lambdas) != order + 1:
+            raise ValueError("Need one lambda for the uniform distribution and every order")
+        self.order = order
+        self.smoothing = smoothing
+        self.k = k
+        self.lambdas = np.asarray(lambdas) / np.sum(lambdas)
+        self.vocab = None
+
+    def fit(self, corpus: Corpus) -> "NGramLanguageModel":
+        """
+        Count all n-grams of the corpus, every sentence is padded with start and end tokens
+        """
+        self.vocab = corpus.vocab
+        # ids after the vocabulary: sentence start, sentence end, unknown word
+        self.bos, self.eos, self.unk = len(self.vocab), len(self.vocab) + 1, len(self.vocab) + 2
+        self.base = len(self.vocab) + 3
+
+        padded, targets = self._pad(corpus.tokens, corpus.offsets)
+        self.n_tokens = len(targets)
+        self.n_types = len(self.vocab) + 1  # words which can be predicted, including the end
+
+        # level m holds the sorted keys of all m-grams and of their histories
+        self.keys, self.counts = {}, {}
+        self.history_keys, self.history_counts = {}, {}
+        for m in range(1, self.order + 1):
+            keys, counts = np.unique(self._keys(padded, targets, m), return_counts=True)
+            self.keys[m], self.counts[m] = keys, counts
+            if m > 1:
+                history, starts = np.unique(keys // self.base, return_index=True)
+                self.history_keys[m] = history
+                self.history_counts[m] = np.add.reduceat(counts, starts)
+        self._lookup = None
+        return self
+
+    def prob(self, word: str, *history: str) -> float:
+        """
+        Probability of word after the history words, e.g. prob("cat", "black")
+        """
+        if self._lookup is None:
+            # hash tables for constant time lookups of single n-grams
+            self._lookup = {
+                m: dict(zip(self.keys[m].tolist(), self.counts[m].tolist()))
+                for m in self.keys
+            }
+            self._history_lookup = {
+                m: dict(zip(self.history_keys[m].tolist(), self.history_counts[m].tolist()))
+                for m in self.history_keys
+            }
+
+        ids = [self.bos] * (self.order - 1) + [self._id(w) for w in history] + [self._id(word)]
+        ids = ids[len(ids) - self.order :]
+
+        def ngram_prob(m: int) -> float:
+            key = 0
+            for i in ids[len(ids) - m :]:
+                key = key * self.base + i
+            count = self._lookup[m].get(key, 0)
+            if m == 1:
+                total = self.n_tokens
+            else:
+                total = self._history_lookup[m].get(key // self.base, 0)
+            if self.smoothing == "add_k":
+                return (count + self.k) / (total + self.k * self.n_types)
+            return count / total if total else None
+
+        if self.smoothing == "add_k":
+            return ngram_prob(self.order)
+        # orders with an unseen history hand their lambda to the others
+        prob, weight = self.lambdas[0] / self.n_types, self.lambdas[0]
+        for m in range(1, self.order + 1):
+            p = ngram_prob(m)
+            if p is not None:
+                prob += self.lambdas[m] * p
+                weight += self.lambdas[m]
+        return prob / weight
+
+    def score(self, sentence: List[str]) -> float:
+        """
+        Log probability of a sentence including its end
+        """
+        return float(self.score_batch([sentence])[0])
+
+    def score_batch(self, sentences: Iterable[List[str]]) -> np.ndarray:
+        """
+        Log probabilities of many sentences at once
+        """
+        tokens, offsets = [], [0]
+        for sentence in sentences:
+            tokens.extend(self._id(word) for word in sentence)
+            offsets.append(len(tokens))
+        return self.score_ids(np.array(tokens, dtype=np.int64), np.array(offsets))
+
+    def score_ids(self, tokens: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """
+        Log probabilities of sentences given as flat word ids with offsets like a corpus
+        """
+        padded, targets = self._pad(tokens, offsets)
+        log_probs = self.log_prob_ngrams(padded, targets)
+        # every sentence has at least its end token, so no reduceat segment is empty
+        starts = offsets[:-1] + np.arange(len(offsets) - 1)
+        return np.add.reduceat(log_probs, starts) if len(starts) else np.zeros(0)
+
+    def log_prob_next(self, histories: np.ndarray, words: np.ndarray) -> np.ndarray:
+        """
+        Log probabilities of word ids after histories of the last order - 1 word ids,
+        sentence starts in the histories are given by the id self.bos
+        """
+        ngrams = np.concatenate([histories, words[:, None]], axis=1)
+        targets = np.arange(1, len(words) + 1) * self.order - 1
+        return self.log_prob_ngrams(ngrams.ravel(), targets)
+
+    def log_prob_ngrams(self, padded: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """
+        Log probabilities of the words at the target positions of a padded id sequence
+        """
+        if self.smoothing == "add_k":
+            count, total = self._ngram_counts(padded, targets, self.order)
+            return np.log((count + self.k) / (total + self.k * self.n_types))
+
+        probs = np.full(len(targets), self.lambdas[0] / self.n_types)
+        # orders with an unseen history hand their lambda to the others
+        weights = np.full(len(targets), self.lambdas[0])
+        for m in range(1, self.order + 1):
+            count, total = self._ngram_counts(padded, targets, m)
+            probs += self.lambdas[m] * np.divide(
+                count, total, out=np.zeros(len(targets)), where=total > 0
+            )
+            weights += self.lambdas[m] * (total > 0)
+        return np.log(probs / weights)
+
+    def _ngram_counts(
+        self, padded: np.ndarray, targets: np.ndarray, m: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Counts of the m-grams ending at the targets and of their histories
+        """
+        keys = self._keys(padded, targets, m)
+        count = _sorted_lookup(self.keys[m], self.counts[m], keys)
+        if m == 1:
+            return count, np.full(len(keys), self.n_tokens)
+        return count, _sorted_lookup(self.history_keys[m], self.history_counts[m], keys // self.base)
+
+    def _keys(self, padded: np.ndarray, targets: np.ndarray, m: int) -> np.ndarray:
+        keys = np.zeros(len(targets), dtype=np.int64)
+        for i in range(m - 1, -1, -1):
+            keys = keys * self.base + padded[targets - i]
+        return keys
+
+    def _pad(self, tokens: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Put order - 1 start tokens before and an end token after every sentence. Returns
+        the padded ids and the positions of all words to predict, i.e. the words and ends.
+        """
+        n_sentences = len(offsets) - 1
+        lengths = np.diff(offsets)
+        pad = self.order - 1
+        padded_offsets = offsets + np.arange(n_sentences + 1) * (pad + 1)
+
+        padded = np.full(padded_offsets[-1], self.bos, dtype=np.int64)
+        sentence = np.repeat(np.arange(n_sentences), lengths)
+        positions = np.arange(len(tokens)) + sentence * (pad + 1) + pad
+        padded[positions] = tokens
+        ends = padded_offsets[1:] - 1
+        padded[ends] = self.eos
+
+        targets = np.sort(np.concatenate([positions, ends]))
+        return padded, targets
+
+    def _id(self, word: str) -> int:
+        return self.vocab.ids.get(word, self.unk)
+
+
+def _sorted_lookup(keys: np.ndarray, values: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    pos = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+    return np.where(keys[pos] == queries, values[pos], 0)
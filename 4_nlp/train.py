@@ -0,0 +1,45 @@
+"""
+Train IBM model 1 translation tables for the europarl language pairs
+"""
+import argparse
+import os
+import time
+
+from translation import IBMModel1, load_parallel_corpus
+
+LANGUAGES = ["de", "fr", "sv"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--languages", nargs="+", default=LANGUAGES, choices=LANGUAGES)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--data", default="./data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--models", default="./models", help="directory of saved models")
+    parser.add_argument(
+        "--resume", action="store_true", help="continue training the saved models"
+    )
+    args = parser.parse_args()
+
+    for lang in args.languages:
+        start_time = time.perf_counter()
+        e_corpus, f_corpus = load_parallel_corpus(
+            f"{args.data}/europarl-v7.{lang}-en.lc.en",
+            f"{args.data}/europarl-v7.{lang}-en.lc.{lang}",
+        )
+        print(f"{lang}-en: {len(e_corpus)} sentence pairs")
+
+        prefix = os.path.join(args.models, f"{lang}-en")
+        if args.resume:
+            model = IBMModel1.load(prefix, workers=args.workers)
+        else:
+            model = IBMModel1(workers=args.workers)
+        model.fit(e_corpus, f_corpus, args.iterations, verbose=True, warm_start=args.resume)
+        model.save(prefix)
+        print(f"{lang}-en trained in {round(time.perf_counter() - start_time, 2)}sec")
+        print(f"Translations of 'european': {model.translations('european', 3)}")
+
+
+if __name__ == "__main__":
+    main()
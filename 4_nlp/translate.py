@@ -0,0 +1,43 @@
+"""
+Translate a foreign text file to english word by word
+"""
+import argparse
+import time
+
+from decoder import Decoder, TranslationIndex
+from language_model import NGramLanguageModel
+from translation import IBMModel1, load_parallel_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", help="file with one lowercased sentence per line")
+    parser.add_argument("--output", help="file to write the translations to")
+    parser.add_argument("--lang", default="de", choices=["de", "fr", "sv"])
+    parser.add_argument("--data", default="./data")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--model", help="saved translation model, trained if not given")
+    parser.add_argument("--order", type=int, default=2, help="order of the language model")
+    parser.add_argument("--beam", type=int, default=5)
+    parser.add_argument("-k", type=int, default=10, help="candidates per foreign word")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    e_corpus, f_corpus = load_parallel_corpus(
+        f"{args.data}/europarl-v7.{args.lang}-en.lc.en",
+        f"{args.data}/europarl-v7.{args.lang}-en.lc.{args.lang}",
+    )
+    if args.model:
+        model = IBMModel1.load(args.model)
+    else:
+        model = IBMModel1().fit(e_corpus, f_corpus, args.iterations)
+    lm = NGramLanguageModel(args.order).fit(e_corpus)
+    index = TranslationIndex(model, k=args.k)
+    print(f"Models ready in {round(time.perf_counter() - start_time, 2)}sec")
+
+    decoder = Decoder(index, lm, beam_size=args.beam)
+    decoder.translate_file(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
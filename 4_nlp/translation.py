@@ -0,0 +1,320 @@
+"""
+IBM model 1 word alignment with a sparse translation table
+
+Sentences are read as corpora of integer word ids, see corpus.py. The translation table
+t(f|e) only holds the word pairs that occur together in at least one sentence pair,
+stored in CSR form with one row per english word e.
+"""
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+from corpus import NULL, Corpus, Vocabulary, load_corpus, save_array
+
+
+class IBMModel1:
+    """
+    Translation probabilities t(f|e) of a foreign word f given an english word e
+
+    The english side of every sentence pair gets an additional NULL word, which has the
+    id 0 in the english vocabulary.
+    """
+
+    def __init__(self, chunk_size: int = 2000, workers: int = 1):
+        """
+        chunk_size: number of sentence pairs whose alignments are computed at once
+        workers: number of processes computing the E-step
+        """
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.e_vocab = None
+        self.f_vocab = None
+        self.probs = None
+        self.history = []
+
+    def fit(
+        self,
+        e_corpus: Corpus,
+        f_corpus: Corpus,
+        iterations: int = 5,
+        verbose: bool = False,
+        warm_start: bool = False,
+    ) -> "IBMModel1":
+        """
+        Estimate the translation table with the EM algorithm
+
+        warm_start: continue from the current table, e.g. of a loaded model, instead of
+        initializing t uniformly
+        """
+        if len(e_corpus) != len(f_corpus):
+            raise ValueError("Corpora must have the same number of sentences")
+        if e_corpus.vocab.words[:1] != [NULL]:
+            raise ValueError(f"English vocabulary must start with {NULL}")
+
+        previous = self._table_by_words() if warm_start and self.probs is not None else None
+        self.e_vocab, self.f_vocab = e_corpus.vocab, f_corpus.vocab
+        chunks = self._build_table(e_corpus, f_corpus, previous)
+        n_tokens = len(e_corpus.tokens) + len(f_corpus.tokens)
+
+        e_step = None
+        if self.workers > 1:
+            e_step = ParallelEStep(chunks, len(self.probs), self.workers)
+        try:
+            for i in range(iterations):
+                start_time = time.perf_counter()
+                if e_step is not None:
+                    counts = e_step(self.probs)
+                else:
+                    counts = np.zeros(len(self.probs))
+                    for cells, groups in chunks:
+                        counts += expected_counts(self.probs, cells, groups)
+                self._maximize(counts)
+
+                seconds = time.perf_counter() - start_time
+                self.history.append({"seconds": seconds, "tokens_per_sec": n_tokens / seconds})
+                if verbose:
+                    print(
+                        f"Iteration {i + 1}: {round(seconds, 2)}sec, "
+                        f"{round(n_tokens / seconds)} tokens/sec"
+                    )
+        finally:
+            if e_step is not None:
+                e_step.close()
+        return self
+
+    def t(self, f: str, e: str) -> float:
+        """
+        Probability of foreign word f given english word e
+        """
+        e_id, f_id = self.e_vocab[e], self.f_vocab[f]
+        row = slice(self.indptr[e_id], self.indptr[e_id + 1])
+        pos = np.searchsorted(self.f_ids[row], f_id)
+        if pos < row.stop - row.start and self.f_ids[row][pos] == f_id:
+            return float(self.probs[row][pos])
+        return 0.0
+
+    def translations(self, e: str, n: int = 10) -> List[Tuple[str, float]]:
+        """
+        Most probable foreign words for the english word e
+        """
+        e_id = self.e_vocab[e]
+        row = slice(self.indptr[e_id], self.indptr[e_id + 1])
+        best = np.argsort(-self.probs[row], kind="stable")[:n]
+        return list(
+            zip(self.f_vocab.decode(self.f_ids[row][best]), self.probs[row][best].tolist())
+        )
+
+    def save(self, prefix: str) -> None:
+        """
+        Store the table as prefix.indptr.npy, prefix.f_ids.npy and prefix.probs.npy plus
+        the vocabularies as prefix.e_vocab.txt and prefix.f_vocab.txt
+        """
+        if os.path.dirname(prefix):
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        # the arrays may be memory-mapped from the files they replace
+        save_array(f"{prefix}.indptr.npy", self.indptr)
+        save_array(f"{prefix}.f_ids.npy", self.f_ids)
+        save_array(f"{prefix}.probs.npy", self.probs)
+        for name, vocab in (("e_vocab", self.e_vocab), ("f_vocab", self.f_vocab)):
+            with open(f"{prefix}.{name}.txt", "w") as f:
+                f.writelines(f"{word}\n" for word in vocab.words)
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True, **kwargs) -> "IBMModel1":
+        """
+        Load a saved model, the table arrays are memory-mapped unless mmap is False
+        """
+        mmap_mode = "r" if mmap else None
+        model = cls(**kwargs)
+        model.indptr = np.load(f"{prefix}.indptr.npy", mmap_mode=mmap_mode)
+        model.f_ids = np.load(f"{prefix}.f_ids.npy", mmap_mode=mmap_mode)
+        model.probs = np.load(f"{prefix}.probs.npy", mmap_mode=mmap_mode)
+        for name in ("e_vocab", "f_vocab"):
+            with open(f"{prefix}.{name}.txt", "r") as f:
+                setattr(model, name, Vocabulary(line.rstrip("\n") for line in f))
+        return model
+
+    def _table_by_words(self) -> Tuple[List[str], List[str], np.ndarray]:
+        """
+        Current table entries as english words, foreign words and probabilities
+        """
+        rows = np.repeat(np.arange(len(self.e_vocab)), np.diff(self.indptr))
+        e_words = np.asarray(self.e_vocab.words, dtype=object)[rows]
+        f_words = np.asarray(self.f_vocab.words, dtype=object)[self.f_ids]
+        return e_words, f_words, np.asarray(self.probs)
+
+    def _build_table(
+        self, e_corpus: Corpus, f_corpus: Corpus, previous=None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Collect all co-occurring word pairs, initialize t uniformly or from the previous
+        table and map every alignment of every sentence pair to its entry in the table
+        """
+        chunk_pairs = []
+        keys = []
+        for start in range(0, len(e_corpus), self.chunk_size):
+            stop = min(start + self.chunk_size, len(e_corpus))
+            e_ids, f_ids, groups = alignment_pairs(e_corpus, f_corpus, start, stop)
+            chunk_pairs.append((e_ids.astype(np.int64) * len(self.f_vocab) + f_ids, groups))
+            keys.append(np.unique(chunk_pairs[-1][0]))
+
+        # sorted keys are the table entries in CSR order
+        keys = np.unique(np.concatenate(keys))
+        rows = keys // len(self.f_vocab)
+        self.f_ids = (keys % len(self.f_vocab)).astype(np.int32)
+        self.rows = rows.astype(np.int32)
+        self.indptr = np.zeros(len(self.e_vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.e_vocab)), out=self.indptr[1:])
+        self.probs = np.full(len(keys), 1 / len(self.f_vocab))
+
+        if previous is not None:
+            # the vocabularies may have changed, so previous entries are matched by words
+            e_words, f_words, probs = previous
+            e_ids = np.array([self.e_vocab.ids.get(w, -1) for w in e_words], dtype=np.int64)
+            f_ids = np.array([self.f_vocab.ids.get(w, -1) for w in f_words], dtype=np.int64)
+            known = (e_ids >= 0) & (f_ids >= 0)
+            previous_keys = e_ids[known] * len(self.f_vocab) + f_ids[known]
+            pos = np.minimum(np.searchsorted(keys, previous_keys), len(keys) - 1)
+            found = keys[pos] == previous_keys
+            self.probs[pos[found]] = probs[known][found]
+
+        return [
+            (np.searchsorted(keys, pair_keys).astype(np.int32), groups)
+            for pair_keys, groups in chunk_pairs
+        ]
+
+    def _maximize(self, counts: np.ndarray) -> None:
+        """
+        M-step, normalize the expected counts per english word
+        """
+        totals = np.bincount(self.rows, weights=counts, minlength=len(self.e_vocab))
+        self.probs = counts / totals[self.rows]
+
+
+def alignment_pairs(
+    e_corpus: Corpus, f_corpus: Corpus, start: int, stop: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All (english word, foreign word) alignments of sentences start to stop, including
+    the NULL word with id 0 on the english side. Groups number the foreign words, the
+    alignment probabilities of a foreign word are normalized within its group.
+    """
+    e_len = e_corpus.lengths[start:stop] + 1
+    f_len = f_corpus.lengths[start:stop]
+    n_cells = e_len * f_len
+    total = n_cells.sum()
+
+    sentence = np.repeat(np.arange(stop - start), n_cells)
+    cell = np.arange(total) - np.repeat(np.cumsum(n_cells) - n_cells, n_cells)
+    i, j = cell // f_len[sentence], cell % f_len[sentence]
+
+    # position 0 of every english sentence is the NULL word
+    e_pos = e_corpus.offsets[start:stop][sentence] + i - 1
+    e_ids = np.where(i > 0, e_corpus.tokens[np.maximum(e_pos, 0)], 0)
+    f_pos = f_corpus.offsets[start:stop][sentence] + j
+    f_ids = f_corpus.tokens[f_pos]
+
+    groups = (f_pos - f_corpus.offsets[start]).astype(np.int32)
+    return e_ids, f_ids, groups
+
+
+def expected_counts(probs: np.ndarray, cells: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """
+    E-step for a chunk of sentence pairs, expected alignment counts per table entry
+    """
+    p = probs[cells]
+    norm = np.bincount(groups, weights=p)
+    return np.bincount(cells, weights=p / norm[groups], minlength=len(probs))
+
+
+class ParallelEStep:
+    """
+    E-step over a process pool
+
+    The translation probabilities and the alignments of all chunks live in shared memory,
+    so they are not copied to the workers. Every worker computes the expected counts of
+    one shard of chunks into its own row of a shared array, the rows are summed up for
+    the M-step.
+    """
+
+    def __init__(
+        self, chunks: List[Tuple[np.ndarray, np.ndarray]], n_entries: int, workers: int
+    ):
+        bounds = np.cumsum([0] + [len(cells) for cells, _ in chunks])
+        self.shards = [list(shard) for shard in np.array_split(np.arange(len(chunks)), workers)]
+
+        self.arrays = {
+            "cells": _SharedArray.copy_of(np.concatenate([c for c, _ in chunks])),
+            "groups": _SharedArray.copy_of(np.concatenate([g for _, g in chunks])),
+            "bounds": _SharedArray.copy_of(bounds),
+            "probs": _SharedArray((n_entries,), np.float64),
+            "counts": _SharedArray((len(self.shards), n_entries), np.float64),
+        }
+        specs = {name: array.spec for name, array in self.arrays.items()}
+        self.pool = ProcessPoolExecutor(workers, initializer=_attach, initargs=(specs,))
+
+    def __call__(self, probs: np.ndarray) -> np.ndarray:
+        self.arrays["probs"].array[:] = probs
+        futures = [
+            self.pool.submit(_shard_counts, i, shard) for i, shard in enumerate(self.shards)
+        ]
+        for future in futures:
+            future.result()
+        return self.arrays["counts"].array.sum(axis=0)
+
+    def close(self) -> None:
+        self.pool.shutdown()
+        for array in self.arrays.values():
+            array.unlink()
+
+
+class _SharedArray:
+    """
+    Numpy array backed by shared memory, attached in other processes by its spec
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.spec = (self.shm.name, shape, np.dtype(dtype).str)
+
+    @classmethod
+    def copy_of(cls, array: np.ndarray) -> "_SharedArray":
+        shared = cls(array.shape, array.dtype)
+        shared.array[:] = array
+        return shared
+
+    def unlink(self) -> None:
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+
+_shared = {}
+
+
+def _attach(specs: dict) -> None:
+    for name, (shm_name, shape, dtype) in specs.items():
+        _shared[name] = _SharedArray(shape, dtype, name=shm_name)
+
+
+def _shard_counts(shard_idx: int, chunk_ids: List[int]) -> None:
+    probs, bounds = _shared["probs"].array, _shared["bounds"].array
+    counts = _shared["counts"].array[shard_idx]
+    counts[:] = 0
+    for c in chunk_ids:
+        chunk = slice(bounds[c], bounds[c + 1])
+        counts += expected_counts(
+            probs, _shared["cells"].array[chunk], _shared["groups"].array[chunk]
+        )
+
+
+def load_parallel_corpus(e_path: str, f_path: str) -> Tuple[Corpus, Corpus]:
+    """
+    Load english and foreign sentence pairs through the corpus cache
+    """
+    return load_corpus(e_path), load_corpus(f_path)
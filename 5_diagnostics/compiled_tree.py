@@ -0,0 +1,142 @@
+"""
+Compiled inference for fitted sklearn decision trees and random forests
+
+All nodes of all trees are flattened into one set of arrays (feature, threshold, left,
+right, value). Predictions walk every (sample, tree) pair down the trees together, one
+level per step, so a batch costs about max depth vectorized steps. The arrays are saved
+as a plain .npz file which loads without sklearn and without unpickling.
+"""
+import numpy as np
+
+LEAF = -1
+
+
+class CompiledForest:
+    """
+    Nodes of all trees, the tree t starts at node roots[t]. Inner nodes send a sample to
+    left if X[feature] <= threshold, otherwise to right. Leaves have left == right == -1
+    and value holds the class probabilities of every node.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        classes: np.ndarray,
+        batch_size: int = 1000,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_sklearn(cls, model, **kwargs) -> "CompiledForest":
+        """
+        Flatten a fitted sklearn DecisionTreeClassifier or RandomForestClassifier, sklearn
+        itself is not imported so compiled models can be used without it
+        """
+        estimators = model.estimators_ if hasattr(model, "estimators_") else [model]
+        trees = [estimator.tree_ for estimator in estimators]
+        sizes = np.array([tree.node_count for tree in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        def children(tree, root):
+            # move the child indices of every tree behind the nodes of the previous trees
+            return [
+                np.where(nodes == LEAF, LEAF, nodes + root)
+                for nodes in (tree.children_left, tree.children_right)
+            ]
+
+        left, right = zip(*(children(tree, root) for tree, root in zip(trees, roots)))
+        # class counts or fractions depending on the sklearn version, normalize to fractions
+        value = np.concatenate([tree.value[:, 0, :] for tree in trees])
+        value = value / value.sum(axis=1, keepdims=True)
+        return cls(
+            np.concatenate([tree.feature for tree in trees]).astype(np.int32),
+            np.concatenate([tree.threshold for tree in trees]),
+            np.concatenate(left).astype(np.int32),
+            np.concatenate(right).astype(np.int32),
+            value,
+            roots.astype(np.int32),
+            np.asarray(model.classes_),
+            **kwargs,
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Leaf reached by every sample in every tree as (samples, trees) matrix
+        """
+        # sklearn compares float32 features to the float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n_samples = len(X)
+        leaves = np.tile(self.roots, n_samples)
+        samples = np.repeat(np.arange(n_samples), self.n_trees)
+
+        active = np.flatnonzero(self.left[leaves] != LEAF)
+        while len(active):
+            nodes = leaves[active]
+            go_left = X[samples[active], self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            leaves[active] = nodes
+            active = active[self.left[nodes] != LEAF]
+        return leaves.reshape(n_samples, self.n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Class probabilities averaged over the trees, computed in batches of samples
+        """
+        X = np.asarray(X)
+        probs = np.empty((len(X), len(self.classes)))
+        for start in range(0, len(X), self.batch_size):
+            leaves = self.apply(X[start : start + self.batch_size])
+            probs[start : start + len(leaves)] = self.value[leaves].mean(axis=1)
+        return probs
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score(self, X, y) -> float:
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+    def save(self, filepath: str) -> None:
+        classes = np.asarray(self.classes)
+        # string labels as fixed width unicode, object arrays would need unpickling
+        if classes.dtype == object:
+            classes = classes.astype(str)
+        np.savez(
+            filepath,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            classes=classes,
+        )
+
+    @classmethod
+    def load(cls, filepath: str, **kwargs) -> "CompiledForest":
+        with np.load(filepath, allow_pickle=False) as data:
+            return cls(
+                data["feature"],
+                data["threshold"],
+                data["left"],
+                data["right"],
+                data["value"],
+                data["roots"],
+                data["classes"],
+                **kwargs,
+            )
@@ -0,0 +1,109 @@
+"""
+Classifiers for the diagnosis of breast cancer cells of the wisconsin dataset
+
+Rules are thresholds on single features, they are evaluated as boolean masks over the
+whole feature matrix so a batch of samples is classified with one comparison per rule.
+"""
+import pickle
+import numpy as np
+import pandas as pd
+from typing import List, NamedTuple, Sequence, Tuple
+from sklearn.metrics import f1_score
+
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+
+
+class Rule(NamedTuple):
+    """
+    Sign of malignancy if the feature compared to the threshold holds, e.g. radius_0 > 15
+    """
+
+    feature: str
+    threshold: float
+    operator: str = ">"
+
+    def __str__(self) -> str:
+        return f"{self.feature} {self.operator} {self.threshold}"
+
+
+# radius and concavity are the features most strongly correlated to malignancy
+DEFAULT_RULES = [Rule("radius_0", 15), Rule("concavity_0", 0.15)]
+
+
+class RuleBasedClassifier:
+    """
+    Predicts malignant (1) if any rule holds, or if all rules hold with combine="all"
+
+    X is a data frame with the rule features as columns or a matrix whose columns are
+    named by feature_names.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Rule] = DEFAULT_RULES,
+        combine: str = "any",
+        feature_names: List[str] = None,
+    ):
+        if combine not in ("any", "all"):
+            raise ValueError(f"Invalid combine: {combine}")
+        for rule in rules:
+            if rule.operator not in OPERATORS:
+                raise ValueError(f"Invalid operator in rule {rule}")
+        self.rules = list(rules)
+        self.combine = combine
+        self.feature_names = feature_names
+
+    def masks(self, X) -> np.ndarray:
+        """
+        Boolean (samples, rules) matrix of which rules hold for which samples
+        """
+        columns = self._columns(X)
+        masks = np.empty((len(columns), len(self.rules)), dtype=bool)
+        for j, rule in enumerate(self.rules):
+            OPERATORS[rule.operator](columns[:, j], rule.threshold, out=masks[:, j])
+        return masks
+
+    def predict(self, X) -> np.ndarray:
+        masks = self.masks(X)
+        hits = masks.any(axis=1) if self.combine == "any" else masks.all(axis=1)
+        return hits.astype(np.int64)
+
+    def score(self, X, y) -> float:
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+    def _columns(self, X) -> np.ndarray:
+        """
+        The feature of every rule as (samples, rules) matrix
+        """
+        features = [rule.feature for rule in self.rules]
+        if isinstance(X, pd.DataFrame):
+            return X[features].to_numpy(dtype=float)
+        if self.feature_names is None:
+            raise ValueError("feature_names are needed to apply rules to a matrix")
+        positions = {name: i for i, name in enumerate(self.feature_names)}
+        return np.asarray(X, dtype=float)[:, [positions[f] for f in features]]
+
+
+def evaluate(model, X, y) -> Tuple[float, float]:
+    """
+    Accuracy and f1 score of a fitted model with one batched predict call
+    """
+    y = np.asarray(y)
+    y_pred = np.asarray(model.predict(X)).ravel()
+    acc = float(np.mean(y_pred == y))
+    return acc, f1_score(y, y_pred)
+
+
+def load_data(filepath: str = "./data/wdbc.pkl", n_features: int = 10) -> pd.DataFrame:
+    """
+    Label "malignant" and the first n_features features of the wdbc data
+    """
+    with open(filepath, "rb") as f:
+        data = pickle.load(f)
+    df = data.drop(["id"], axis=1)
+    return df.iloc[:, : n_features + 1]
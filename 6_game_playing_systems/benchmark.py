@@ -0,0 +1,147 @@
+"""
+Strength of the tree search by number of simulations per move against the random and
+heuristic opponents, for plain UCT and RAVE with random and heuristic rollouts
+"""
+import argparse
+import random
+import time
+import numpy as np
+import pandas as pd
+
+from mctspy.tree.nodes import TwoPlayersGameMonteCarloTreeSearchNode as TreeSearchNode
+from mctspy.tree.search import MonteCarloTreeSearch
+from mctspy.games.examples.tictactoe import TicTacToeGameState
+from opponent import RandomAgent, HeuristicAgent, pick_move
+
+# search settings passed to the root node
+CONFIGS = {
+    "UCT": {},
+    "UCT heuristic": {"rollout_policy": "heuristic"},
+    "RAVE": {"rave": True},
+    "RAVE heuristic": {"rave": True, "rollout_policy": "heuristic"},
+}
+
+
+def play(config: dict, simulations: int, opponent, next_to_move: int, size: int = 3):
+    """
+    Play one game of the search as player 1 against the opponent as player -1.
+    Returns the result and the seconds per search move.
+    """
+    state = TicTacToeGameState(state=np.zeros((size, size)), next_to_move=next_to_move)
+    search_seconds, search_moves = 0.0, 0
+    while not state.is_game_over():
+        if next_to_move == 1:
+            start_time = time.perf_counter()
+            root = TreeSearchNode(state=state, **config)
+            action = MonteCarloTreeSearch(root).best_action(simulations)
+            move = pick_move(state, action, next_to_move)
+            search_seconds += time.perf_counter() - start_time
+            search_moves += 1
+        else:
+            move = opponent.policy(state)
+        state = state.move(move)
+        next_to_move = -next_to_move
+    return state.game_result, search_seconds / max(search_moves, 1)
+
+
+def evaluate(
+    config: dict, simulations: int, opponent_policy: str, games: int, seed: int = 0
+) -> dict:
+    """
+    Win, draw and loss rates over games, the opponent starts every second game
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    opponent = RandomAgent() if opponent_policy == "random" else HeuristicAgent(3)
+    results, seconds = [], []
+    for i in range(games):
+        first = 1 if i % 2 else -1
+        result, sec = play(config, simulations, opponent, next_to_move=first)
+        results.append(result)
+        seconds.append(sec)
+    results = np.array(results)
+    return {
+        "win": np.mean(results == 1),
+        "draw": np.mean(results == 0),
+        "loss": np.mean(results == -1),
+        # perfect tic tac toe play never loses, so not losing measures the strength
+        "not_lost": np.mean(results != -1),
+        "sec_per_move": np.mean(seconds),
+    }
+
+
+def simulations_needed(results: pd.DataFrame, baseline: str = "UCT") -> pd.DataFrame:
+    """
+    Fewest simulations from which on every config does not lose at least as often as
+    the baseline with the most simulations, per opponent
+    """
+    rows = []
+    for opponent, group in results.groupby("opponent", sort=False):
+        base = group[group["config"] == baseline]
+        target = base.loc[base["simulations"].idxmax(), "not_lost"]
+        for config, runs in group.groupby("config", sort=False):
+            runs = runs.sort_values("simulations")
+            # all larger budgets have to reach the target too, lucky runs do not count
+            reached = (runs["not_lost"] >= target)[::-1].cummin()[::-1]
+            rows.append(
+                {
+                    "opponent": opponent,
+                    "config": config,
+                    "target_not_lost": target,
+                    "simulations": runs["simulations"][reached].min(),
+                }
+            )
+    needed = pd.DataFrame(rows)
+    base = needed[needed["config"] == baseline].set_index("opponent")["simulations"]
+    base_sims = base[needed["opponent"]].to_numpy()
+    needed["fewer_than_" + baseline] = base_sims / needed["simulations"]
+    return needed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--simulations",
+        type=int,
+        nargs="+",
+        default=[10, 25, 50, 100, 200, 400, 800],
+    )
+    parser.add_argument("--games", type=int, default=40, help="games per setting")
+    parser.add_argument(
+        "--opponents",
+        nargs="+",
+        default=["random", "heuristic"],
+        choices=["random", "heuristic"],
+    )
+    parser.add_argument(
+        "--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS)
+    )
+    parser.add_argument("--output", help="csv file to write the results to")
+    args = parser.parse_args()
+
+    rows = []
+    for opponent in args.opponents:
+        for name in args.configs:
+            for simulations in args.simulations:
+                row = evaluate(CONFIGS[name], simulations, opponent, args.games)
+                rows.append(
+                    {"opponent": opponent, "config": name, "simulations": simulations}
+                )
+                rows[-1].update(row)
+                print(
+                    f"{opponent:>9} {name:>14} {simulations:>5} sims: "
+                    f"win {row['win']:.2f} draw {row['draw']:.2f} "
+                    f"loss {row['loss']:.2f} "
+                    f"({round(row['sec_per_move'] * 1000, 1)}ms/move)"
+                )
+    results = pd.DataFrame(rows)
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+    if "UCT" in args.configs:
+        print("\nSimulations per move to lose as rarely as UCT at its largest budget")
+        print(simulations_needed(results).round(decimals=2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,8 @@ def play(
     next_to_move: int,
     game_idx: int,
     opponent_policy: str = "random",
+    simulations: int = 10000,
+    search_config: dict = None,
     verbose: bool = False,
 ):
     print(f"Playing game {game_idx+1}")
@@ -38,12 +40,12 @@ def play(
 
     while not done:
         # pick action for player whos turn it is
-        root = TreeSearchNode(state=state)
+        root = TreeSearchNode(state=state, **(search_config or {}))
         mcts = MonteCarloTreeSearch(root)
 
         # player
         if next_to_move == 1:
-            action = mcts.best_action(10000)
+            action = mcts.best_action(simulations)
             move = pick_move(state, action, next_to_move)
         # opponent
         elif next_to_move == -1:
@@ -85,6 +87,10 @@ state = np.zeros((size, size))
 next_to_move = -1  # 1 player starts, -1 opponent starts
 games = 10  # number of played games
 opponent_policy = "random"  # random, heuristic, selfplay, human
+simulations = 10000  # simulations per move
+# rollout_policy: random, heuristic or a function (state, possible_moves) -> move
+# rave: blend all-moves-as-first statistics into the selection, see benchmark.py
+search_config = {"rollout_policy": "random", "rave": False}
 
 initial_board_state = TicTacToeGameState(state=state, next_to_move=next_to_move)
 
@@ -95,6 +101,8 @@ results = [
         next_to_move,
         i,
         opponent_policy=opponent_policy,
+        simulations=simulations,
+        search_config=search_config,
         verbose=True,
     )
     for i in range(games)
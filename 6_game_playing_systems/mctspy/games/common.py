@@ -52,6 +52,30 @@ class TwoPlayersAbstractGameState(ABC):
         """
         pass
 
+    def winning_actions(self):
+        """
+        legal actions which win the game immediately for the player to move,
+        games can override this with a faster check
+        Returns
+        -------
+        list of AbstractGameAction
+        """
+        return [
+            action
+            for action in self.get_legal_actions()
+            if self.move(action).game_result == self.next_to_move
+        ]
+
+    def blocking_actions(self):
+        """
+        legal actions which take away an immediate win of the opponent,
+        empty unless the game overrides it
+        Returns
+        -------
+        list of AbstractGameAction
+        """
+        return []
+
 
 class AbstractGameAction(ABC):
     pass
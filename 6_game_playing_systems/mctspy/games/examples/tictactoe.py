@@ -13,6 +13,15 @@ class TicTacToeMove(AbstractGameAction):
             self.x_coordinate, self.y_coordinate, self.value
         )
 
+    def __eq__(self, other):
+        return isinstance(other, TicTacToeMove) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def _key(self):
+        return int(self.x_coordinate), int(self.y_coordinate), int(self.value)
+
 
 class TicTacToeGameState(TwoPlayersAbstractGameState):
 
@@ -95,6 +104,39 @@ class TicTacToeGameState(TwoPlayersAbstractGameState):
 
         return TicTacToeGameState(new_board, next_to_move)
 
+    def winning_actions(self):
+        return [
+            TicTacToeMove(x, y, self.next_to_move)
+            for x, y in self._completing_cells(self.next_to_move)
+        ]
+
+    def blocking_actions(self):
+        return [
+            TicTacToeMove(x, y, self.next_to_move)
+            for x, y in self._completing_cells(-self.next_to_move)
+        ]
+
+    def _completing_cells(self, player):
+        """
+        empty cells which complete a line of the player, a line summing to
+        (board_size - 1) * player has exactly one empty cell left
+        """
+        target = (self.board_size - 1) * player
+        index = np.arange(self.board_size)
+        lines = [(i, index) for i in np.flatnonzero(self.board.sum(axis=1) == target)]
+        lines += [(index, j) for j in np.flatnonzero(self.board.sum(axis=0) == target)]
+        if self.board.trace() == target:
+            lines.append((index, index))
+        if self.board[::-1].trace() == target:
+            lines.append((index[::-1], index))
+
+        cells = set()
+        for rows, cols in lines:
+            rows, cols = np.broadcast_arrays(rows, cols)
+            empty = np.flatnonzero(self.board[rows, cols] == 0)[0]
+            cells.add((int(rows[empty]), int(cols[empty])))
+        return sorted(cells)
+
     def get_legal_actions(self):
         indices = np.where(self.board == 0)
         return [
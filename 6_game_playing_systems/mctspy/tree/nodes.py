@@ -3,18 +3,65 @@ from collections import defaultdict
 from abc import ABC, abstractmethod
 
 
+def random_rollout(state, possible_moves):
+    return possible_moves[np.random.randint(len(possible_moves))]
+
+
+def heuristic_rollout(state, possible_moves):
+    """
+    win if possible, otherwise block a win of the opponent, otherwise random
+    """
+    moves = state.winning_actions() or state.blocking_actions() or possible_moves
+    return moves[np.random.randint(len(moves))]
+
+
+ROLLOUT_POLICIES = {"random": random_rollout, "heuristic": heuristic_rollout}
+
+
 class MonteCarloTreeSearchNode(ABC):
-    def __init__(self, state, parent=None):
+    def __init__(
+        self,
+        state,
+        parent=None,
+        action=None,
+        rollout_policy=None,
+        rave=None,
+        rave_equivalence=None,
+    ):
         """
         Parameters
         ----------
         state : mctspy.games.common.TwoPlayersAbstractGameState
         parent : MonteCarloTreeSearchNode
+        action : mctspy.games.common.AbstractGameAction
+            action leading from the parent to this node
+        rollout_policy : str or callable
+            "random", "heuristic" or a function (state, possible_moves) -> move,
+            children inherit the settings of their parent, default "random"
+        rave : bool
+            keep all-moves-as-first statistics and blend them into the selection
+        rave_equivalence : float
+            number of visits at which tree and AMAF values get equal weight
         """
         self.state = state
         self.parent = parent
+        self.action = action
         self.children = []
 
+        def inherit(value, name, default):
+            if value is not None:
+                return value
+            return getattr(parent, name) if parent is not None else default
+
+        policy = inherit(rollout_policy, "_rollout_policy", "random")
+        if not callable(policy):
+            if policy not in ROLLOUT_POLICIES:
+                raise ValueError("Invalid rollout policy: {0}".format(policy))
+            policy = ROLLOUT_POLICIES[policy]
+        self._rollout_policy = policy
+        self.rave = inherit(rave, "rave", False)
+        self.rave_equivalence = inherit(rave_equivalence, "rave_equivalence", 300)
+
     @property
     @abstractmethod
     def untried_actions(self):
@@ -51,28 +98,50 @@ class MonteCarloTreeSearchNode(ABC):
     def backpropagate(self, reward):
         pass
 
+    @property
+    def amaf_q(self):
+        return 0.0
+
+    @property
+    def amaf_n(self):
+        return 0.0
+
     def is_fully_expanded(self):
         return len(self.untried_actions) == 0
 
     def best_child(self, c_param=1.4):
         """
-        UCT
+        UCT, with RAVE the mean value is blended with the AMAF value of the child
+        by beta = sqrt(k / (3 n + k)) which goes to 0 as visits n outweigh the
+        equivalence parameter k
         """
         choices_weights = [
-            (c.q / c.n) + c_param * np.sqrt(np.log(self.n) / c.n) for c in self.children
+            self._value(c) + c_param * np.sqrt(np.log(self.n) / c.n)
+            for c in self.children
         ]
         return self.children[np.argmax(choices_weights)]
 
-    def rollout_policy(self, possible_moves, policy="ucb"):
-        return possible_moves[np.random.randint(len(possible_moves))]
+    def _value(self, child):
+        value = child.q / child.n
+        if not self.rave or child.amaf_n == 0:
+            return value
+        beta = np.sqrt(self.rave_equivalence / (3 * child.n + self.rave_equivalence))
+        return (1 - beta) * value + beta * child.amaf_q / child.amaf_n
+
+    def rollout_policy(self, possible_moves, state=None):
+        state = state if state is not None else self.state
+        return self._rollout_policy(state, possible_moves)
 
 
 class TwoPlayersGameMonteCarloTreeSearchNode(MonteCarloTreeSearchNode):
-    def __init__(self, state, parent=None):
-        super().__init__(state, parent)
+    def __init__(self, state, parent=None, **kwargs):
+        super().__init__(state, parent, **kwargs)
         self._number_of_visits = 0.0
         self._results = defaultdict(int)
         self._untried_actions = None
+        self._amaf_visits = 0.0
+        self._amaf_results = defaultdict(int)
+        self._rollout_actions = []
 
     @property
     def untried_actions(self):
@@ -90,10 +159,22 @@ class TwoPlayersGameMonteCarloTreeSearchNode(MonteCarloTreeSearchNode):
     def n(self):
         return self._number_of_visits
 
+    @property
+    def amaf_q(self):
+        wins = self._amaf_results[self.parent.state.next_to_move]
+        loses = self._amaf_results[-1 * self.parent.state.next_to_move]
+        return wins - loses
+
+    @property
+    def amaf_n(self):
+        return self._amaf_visits
+
     def expand(self):
         action = self.untried_actions.pop()
         next_state = self.state.move(action)
-        child_node = TwoPlayersGameMonteCarloTreeSearchNode(next_state, parent=self)
+        child_node = TwoPlayersGameMonteCarloTreeSearchNode(
+            next_state, parent=self, action=action
+        )
         self.children.append(child_node)
         return child_node
 
@@ -102,14 +183,32 @@ class TwoPlayersGameMonteCarloTreeSearchNode(MonteCarloTreeSearchNode):
 
     def rollout(self):
         current_rollout_state = self.state
+        self._rollout_actions = []
         while not current_rollout_state.is_game_over():
             possible_moves = current_rollout_state.get_legal_actions()
-            action = self.rollout_policy(possible_moves)
+            action = self.rollout_policy(possible_moves, current_rollout_state)
+            if self.rave:
+                self._rollout_actions.append(action)
             current_rollout_state = current_rollout_state.move(action)
         return current_rollout_state.game_result
 
-    def backpropagate(self, result):
+    def backpropagate(self, result, played=None):
+        """
+        played holds the actions made after this node in the simulation, with
+        RAVE every child whose action was played later counts the result as if
+        its action had been played first. Actions compare equal only for the same
+        player, so only moves of the player to move here are counted.
+        """
         self._number_of_visits += 1.0
         self._results[result] += 1.0
+        if self.rave:
+            if played is None:
+                played = set(self._rollout_actions)
+            for child in self.children:
+                if child.action in played:
+                    child._amaf_visits += 1.0
+                    child._amaf_results[result] += 1.0
+            if self.action is not None:
+                played.add(self.action)
         if self.parent:
-            self.parent.backpropagate(result)
+            self.parent.backpropagate(result, played)
@@ -0,0 +1,122 @@
+"""
+Load test of the chat server with many simulated clients
+
+The server runs in this process with stubbed task handlers, so no API keys are needed
+and no web API is called. The handlers sleep for --handler-delay seconds instead to
+simulate the latency of the APIs, everything else is measured as in production.
+
+Usage: python load_test.py --clients 50 --requests 20 --handler-delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Dict, List
+
+import spacy
+from spacy import Language
+from main import INTENT_EXAMPLES, MODEL, Chatbot
+from server import ChatServer, percentiles
+
+STATEMENTS = [
+    "What is the weather in London?",
+    "How is the weather in Stockholm today",
+    "Where is the Eiffel Tower?",
+    "Where is Chalmers University",
+    "What is the stock price of Apple?",
+    "Tell me the stock price of Microsoft",
+    "What can this chatbot do?",
+    "And in Paris?",
+    "I like turtles",
+]
+
+
+def stub_handlers(delay: float) -> Dict[str, Callable[[Language], str]]:
+    def stub(intent: str) -> Callable[[Language], str]:
+        def handle(statement: Language) -> str:
+            time.sleep(delay)
+            entities = ", ".join(ent.text for ent in statement.ents)
+            return f"Stubbed {intent} answer for [{entities}]"
+
+        return handle
+
+    return {intent: stub(intent) for intent in INTENT_EXAMPLES}
+
+
+async def client(host: str, port: int, n_requests: int, latencies: List[float]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    for _ in range(n_requests):
+        start_time = time.perf_counter()
+        writer.write((random.choice(STATEMENTS) + "\n").encode())
+        await writer.drain()
+        json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start_time)
+    writer.write(b"exit\n")
+    await writer.drain()
+    await reader.read()
+    writer.close()
+
+
+async def run(args: argparse.Namespace) -> None:
+    bot = Chatbot(spacy.load(args.model), handlers=stub_handlers(args.handler_delay))
+    chat_server = ChatServer(
+        bot, args.nlp_workers, args.handler_workers, args.max_pending
+    )
+    server = await chat_server.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    latencies = []
+    start_time = time.perf_counter()
+    await asyncio.gather(
+        *[
+            client("127.0.0.1", port, args.requests, latencies)
+            for _ in range(args.clients)
+        ]
+    )
+    seconds = time.perf_counter() - start_time
+
+    p50, p95, p99 = percentiles(latencies, [0.5, 0.95, 0.99])
+    print(
+        f"{args.clients} clients sent {len(latencies)} requests "
+        f"in {round(seconds, 2)}sec: {round(len(latencies) / seconds, 1)} requests/sec"
+    )
+    print(
+        f"Client latency p50 {round(p50 * 1000, 1)}ms, p95 {round(p95 * 1000, 1)}ms, "
+        f"p99 {round(p99 * 1000, 1)}ms"
+    )
+
+    # counters of the server itself
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"stats\nexit\n")
+    await writer.drain()
+    print(f"Server stats: {(await reader.readline()).decode().strip()}")
+    # wait until the server closed the session
+    await reader.read()
+    writer.close()
+
+    server.close()
+    await server.wait_closed()
+    chat_server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument(
+        "--handler-delay", type=float, default=0.05, help="simulated API latency in sec"
+    )
+    parser.add_argument("--model", default=MODEL, help="spaCy model")
+    parser.add_argument("--nlp-workers", type=int, default=2)
+    parser.add_argument("--handler-workers", type=int, default=16)
+    parser.add_argument("--max-pending", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,8 @@
 import spacy
 from spacy import Language
-from tasks.places import handle_place
-from tasks.weather import handle_weather
-from tasks.finance import handle_stock
-from tasks.help import handle_help
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 
-# load language model
-nlp = spacy.load("en_core_web_md")
+MODEL = "en_core_web_md"
 
 """
 Tasks:
@@ -16,13 +11,33 @@ Tasks:
 - find stock price
 """
 
-# maps intents to actions
-INTENT_HANDLER = {
-    "weather": handle_weather,
-    "place": handle_place,
-    "stock": handle_stock,
-    "help": handle_help,
+# example statement of every intent
+INTENT_EXAMPLES = {
+    "weather": "Current weather in a city",
+    "place": "Where is this place",
+    "stock": "What is the stock price",
+    "help": "What can this chatbot do?",
 }
+MIN_SIMILARITY = 0.7
+NOT_UNDERSTOOD = "Sorry I don't understand that. Please rephrase your statement"
+
+
+def load_handlers() -> Dict[str, Callable[[Language], str]]:
+    """
+    Maps intents to actions, the task modules are imported here since they need the
+    API keys
+    """
+    from tasks.places import handle_place
+    from tasks.weather import handle_weather
+    from tasks.finance import handle_stock
+    from tasks.help import handle_help
+
+    return {
+        "weather": handle_weather,
+        "place": handle_place,
+        "stock": handle_stock,
+        "help": handle_help,
+    }
 
 
 def calc_similarities(tasks: List[Language], statement: Language):
@@ -36,37 +51,57 @@ def calc_similarities(tasks: List[Language], statement: Language):
     return res
 
 
-def chatbot(statement: str) -> str:
-    weather = ("weather", nlp("Current weather in a city"))
-    place = ("place", nlp("Where is this place"))
-    stock = ("stock", nlp("What is the stock price"))
-    helper = ("help", nlp("What can this chatbot do?"))
-    tasks = [weather, place, stock, helper]
-
-    statement = nlp(statement)
-
-    min_similarity = 0.7
-
-    # calc similarities
-    sims = calc_similarities(tasks, statement)
-    intent_name, intent_sim = sims[-1]
-
-    if intent_sim >= min_similarity:
-        return INTENT_HANDLER[intent_name](statement)
-    else:
-        return "Sorry I don't understand that. Please rephrase your statement"
-
-
-def start() -> None:
+class Chatbot:
+    """
+    Finds the intent of a statement by its similarity to the intent examples and
+    answers with the handler of the intent
+    """
+
+    def __init__(
+        self,
+        nlp: Language,
+        handlers: Dict[str, Callable[[Language], str]] = None,
+        min_similarity: float = MIN_SIMILARITY,
+    ):
+        self.nlp = nlp
+        self.handlers = handlers if handlers is not None else load_handlers()
+        self.min_similarity = min_similarity
+        # parse the intent examples once instead of for every statement
+        self.tasks = [
+            (intent, nlp(example)) for intent, example in INTENT_EXAMPLES.items()
+        ]
+
+    def understand(self, statement: str) -> Tuple[Language, Optional[str]]:
+        """
+        Parse the statement and find its intent, None if it is not understood
+        """
+        doc = self.nlp(statement)
+        intent_name, intent_sim = calc_similarities(self.tasks, doc)[-1]
+        if intent_sim >= self.min_similarity:
+            return doc, intent_name
+        return doc, None
+
+    def respond(self, statement: Language, intent: Optional[str]) -> str:
+        if intent is None:
+            return NOT_UNDERSTOOD
+        return self.handlers[intent](statement)
+
+    def __call__(self, statement: str) -> str:
+        return self.respond(*self.understand(statement))
+
+
+def start(bot: Chatbot) -> None:
     while True:
         phrase = input("How can I help you?\nType 'Exit' to exit the chatbot\n> ")
 
         # exit check
         if phrase.lower() == "exit":
-            quit()
+            return
 
-        response = chatbot(phrase)
+        response = bot(phrase)
         print(f"Bot: {response}")
 
 
-start()
+if __name__ == "__main__":
+    # load language model
+    start(Chatbot(spacy.load(MODEL)))
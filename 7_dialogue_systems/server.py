@@ -0,0 +1,243 @@
+"""
+Asyncio chat server for the chatbot
+
+Clients connect over TCP and send one statement per line, every connection is a session
+with its own conversation state. All sessions share one loaded spaCy model. Parsing runs
+in a bounded thread pool so the event loop keeps serving the other clients, and the task
+handlers which call the web APIs run in a second pool. Every answer is one JSON line,
+the line "stats" returns the latency and throughput counters of the server.
+
+Usage: python server.py --port 8765
+       nc localhost 8765
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, List, Optional, Tuple
+
+import spacy
+from main import MODEL, Chatbot
+
+
+class BoundedExecutor:
+    """
+    Thread pool admitting at most max_pending calls at once, further calls wait in the
+    event loop instead of piling up in the queue of the pool
+    """
+
+    def __init__(self, workers: int, max_pending: int = None):
+        self.pool = ThreadPoolExecutor(workers)
+        self.slots = asyncio.Semaphore(max_pending or 2 * workers)
+
+    async def run(self, fn: Callable, *args):
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, fn, *args)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False)
+
+
+HISTORY_SIZE = 20
+
+
+@dataclass
+class Session:
+    id: int
+    started: float = field(default_factory=time.perf_counter)
+    requests: int = 0
+    last_intent: Optional[str] = None
+    # last statements and their intents
+    history: Deque[Tuple[str, Optional[str]]] = field(
+        default_factory=lambda: deque(maxlen=HISTORY_SIZE)
+    )
+
+
+def percentiles(values: List[float], qs: List[float]) -> List[float]:
+    values = sorted(values)
+    if not values:
+        return [0.0] * len(qs)
+    return [values[min(int(q * len(values)), len(values) - 1)] for q in qs]
+
+
+class Metrics:
+    """
+    Request counters and the latencies of the last window requests
+    """
+
+    def __init__(self, window: int = 10000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.sessions = 0
+        self.active_sessions = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds: float, error: bool = False) -> None:
+        self.requests += 1
+        self.errors += error
+        self.latencies.append(seconds)
+
+    def snapshot(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        p50, p95, p99 = percentiles(list(self.latencies), [0.5, 0.95, 0.99])
+        return {
+            "uptime_sec": round(uptime, 2),
+            "requests": self.requests,
+            "errors": self.errors,
+            "sessions": self.sessions,
+            "active_sessions": self.active_sessions,
+            "requests_per_sec": round(self.requests / uptime, 2),
+            "latency_ms": {
+                "p50": round(p50 * 1000, 2),
+                "p95": round(p95 * 1000, 2),
+                "p99": round(p99 * 1000, 2),
+                "max": round(max(self.latencies, default=0.0) * 1000, 2),
+            },
+        }
+
+
+class ChatServer:
+    def __init__(
+        self,
+        bot: Chatbot,
+        nlp_workers: int = 2,
+        handler_workers: int = 16,
+        max_pending: int = None,
+    ):
+        self.bot = bot
+        self.nlp_workers = nlp_workers
+        self.handler_workers = handler_workers
+        self.max_pending = max_pending
+        self.metrics = Metrics()
+        self._session_ids = itertools.count(1)
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 8765
+    ) -> asyncio.AbstractServer:
+        # the semaphores of the pools belong to the running event loop
+        self.nlp_pool = BoundedExecutor(self.nlp_workers, self.max_pending)
+        self.handler_pool = BoundedExecutor(self.handler_workers)
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def serve(
+        self, host: str = "127.0.0.1", port: int = 8765, stats_interval: float = None
+    ) -> None:
+        server = await self.start(host, port)
+        print(f"Serving on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+        if stats_interval:
+            asyncio.create_task(self._print_stats(stats_interval))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.nlp_pool.shutdown()
+        self.handler_pool.shutdown()
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        session = Session(next(self._session_ids))
+        self.metrics.sessions += 1
+        self.metrics.active_sessions += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # the line is longer than the limit of the stream, its start is
+                    # dropped already so the session can not continue in sync
+                    await self.send(writer, {"error": "Statement too long"})
+                    break
+                if not line:
+                    break
+                statement = line.decode(errors="replace").strip()
+                if not statement:
+                    continue
+                if statement.lower() == "exit":
+                    break
+                if statement.lower() == "stats":
+                    answer = self.metrics.snapshot()
+                else:
+                    answer = await self.answer(session, statement)
+                await self.send(writer, answer)
+        except ConnectionError:
+            pass
+        finally:
+            self.metrics.active_sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def send(writer: asyncio.StreamWriter, answer: dict) -> None:
+        writer.write((json.dumps(answer) + "\n").encode())
+        await writer.drain()
+
+    async def answer(self, session: Session, statement: str) -> dict:
+        start_time = time.perf_counter()
+        error = False
+        try:
+            doc, intent = await self.nlp_pool.run(self.bot.understand, statement)
+            response = await self.handler_pool.run(self.bot.respond, doc, intent)
+        except Exception as e:
+            print(f"[!] Session {session.id} failed on {statement!r}: {e!r}")
+            intent, response, error = None, "Something went wrong", True
+        latency = time.perf_counter() - start_time
+        self.metrics.record(latency, error)
+
+        session.requests += 1
+        session.history.append((statement, intent))
+        session.last_intent = intent or session.last_intent
+        return {
+            "session": session.id,
+            "intent": intent,
+            "response": response,
+            "latency_ms": round(latency * 1000, 2),
+        }
+
+    async def _print_stats(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            print(json.dumps(self.metrics.snapshot()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=MODEL, help="spaCy model")
+    parser.add_argument(
+        "--nlp-workers", type=int, default=2, help="threads parsing statements"
+    )
+    parser.add_argument(
+        "--handler-workers", type=int, default=16, help="threads calling the web APIs"
+    )
+    parser.add_argument(
+        "--max-pending", type=int, help="statements in the parsing pool at once"
+    )
+    parser.add_argument(
+        "--stats-interval", type=float, help="seconds between printed counters"
+    )
+    args = parser.parse_args()
+
+    bot = Chatbot(spacy.load(args.model))
+    server = ChatServer(bot, args.nlp_workers, args.handler_workers, args.max_pending)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Cross validated comparison of all classifiers on the extracted feature sets
+
+Every (feature set, selection, classifier, fold) combination is one task of a process
+pool. The standard scaler and the feature statistics of every fold are fitted once in
+the main process and the scaled folds are sent to each worker once when the pool
+starts, so the tasks only fit and predict.
+
+Usage: python benchmark.py --features features.csv features_var.csv --folds 5 -k 10 20
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, matthews_corrcoef, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler, label_binarize
+from sklearn.svm import SVC
+
+from feature_selection import FeatureStatistics, load_features
+
+try:
+    from xgboost import XGBClassifier, XGBRFClassifier
+except ImportError:
+    XGBClassifier = XGBRFClassifier = None
+
+try:
+    import torch
+    from mlp_pytorch import Net as TorchMLP, NetParams as TorchMLPParams
+    from lstm import LSTMNet, LSTMNetParams
+except ImportError:
+    torch = None
+
+FEATURE_SETS = ["features.csv", "features_var.csv", "features_30_sec.csv"]
+METRICS = ["accuracy", "F1", "AUC", "MCC", "fit_sec", "predict_sec"]
+
+
+class TorchModel:
+    """
+    Fit and predict the pytorch nets on numpy arrays like a sklearn classifier, the LSTM
+    takes every sample as a sequence of length 1
+    """
+
+    def __init__(self, net, sequence: bool = False):
+        self.net = net
+        self.sequence = sequence
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> "TorchModel":
+        self.net.fit(self._tensor(X), torch.LongTensor(y))
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.net.predict(self._tensor(X))
+
+    def _tensor(self, X: np.ndarray):
+        X = torch.FloatTensor(X)
+        return X.reshape(X.shape[0], 1, X.shape[1]) if self.sequence else X
+
+
+def _torch_mlp(n_features: int, n_classes: int) -> TorchModel:
+    params = TorchMLPParams(
+        input_features=n_features,
+        hidden_size=100,
+        num_classes=n_classes,
+        epochs=1000,
+        learning_rate=0.01,
+    )
+    return TorchModel(TorchMLP(params))
+
+
+def _lstm(n_features: int, n_classes: int) -> TorchModel:
+    params = LSTMNetParams(
+        num_epochs=2000,
+        learning_rate=0.01,
+        dropout=0.3,
+        input_size=n_features,
+        hidden_size=20,
+        hidden_layer=50,
+        num_layers=1,
+        num_classes=n_classes,
+        seq_length=1,
+        tensorboard=False,
+    )
+    return TorchModel(LSTMNet(params), sequence=True)
+
+
+# name -> function building an unfitted model from the number of features and classes
+CLASSIFIERS: Dict[str, Callable[[int, int], object]] = {
+    "Logistic regression": lambda n, c: LogisticRegression(random_state=42, max_iter=500),
+    "Gaussian naive bayes": lambda n, c: GaussianNB(),
+    "SVC": lambda n, c: SVC(gamma="scale", C=3, kernel="rbf", random_state=42),
+    "Random forest": lambda n, c: RandomForestClassifier(random_state=42),
+    "MLP Sklearn": lambda n, c: MLPClassifier(
+        random_state=42,
+        max_iter=1000,
+        activation="tanh",
+        solver="adam",
+        alpha=0.0001,
+        learning_rate="adaptive",
+        learning_rate_init=0.01,
+    ),
+}
+if XGBClassifier is not None:
+    CLASSIFIERS["XGBoost"] = lambda n, c: XGBClassifier(
+        n_estimators=1000,
+        booster="gbtree",
+        learning_rate=0.04,
+        eval_metric="mlogloss",
+        random_state=42,
+    )
+    CLASSIFIERS["XGBoost random forests"] = lambda n, c: XGBRFClassifier(
+        n_estimators=1000,
+        booster="gbtree",
+        learning_rate=0.04,
+        objective="multi:softmax",
+        eval_metric="mlogloss",
+        random_state=42,
+    )
+if torch is not None:
+    CLASSIFIERS["MLP PyTorch"] = _torch_mlp
+    CLASSIFIERS["LSTM"] = _lstm
+
+
+def assess(y_test: np.ndarray, y_pred: np.ndarray, labels: List[int]) -> Tuple[float, ...]:
+    """
+    Accuracy, F1 score, AUC score and matthews correlation coefficient of predictions
+    """
+    acc = accuracy_score(y_test, y_pred)
+    f1 = f1_score(y_test, y_pred, average="weighted")
+    # binarize labels for multi class roc score
+    y_test_bin = label_binarize(y_test, classes=labels)
+    y_pred_bin = label_binarize(y_pred, classes=labels)
+    roc = roc_auc_score(y_test_bin, y_pred_bin, average="weighted", multi_class="ovo")
+    return acc, f1, roc, matthews_corrcoef(y_test, y_pred)
+
+
+def scaled_folds(X: np.ndarray, y: np.ndarray, n_splits: int, seed: int = 42) -> List[tuple]:
+    """
+    (X_train, X_test, y_train, y_test) of every fold, scaled by a standard scaler fitted
+    on the training part of the fold only
+    """
+    folds = []
+    splits = StratifiedKFold(n_splits, shuffle=True, random_state=seed).split(X, y)
+    for train, test in splits:
+        scaler = StandardScaler().fit(X[train])
+        folds.append((scaler.transform(X[train]), scaler.transform(X[test]), y[train], y[test]))
+    return folds
+
+
+def fold_selections(
+    folds: List[tuple], k_values: List[int], score: str = "f"
+) -> Dict[int, List[np.ndarray]]:
+    """
+    Column indices of the k best features of every fold by the statistics of its
+    training part, k = None keeps all features
+    """
+    n_features = folds[0][0].shape[1]
+    stats = [
+        FeatureStatistics.fit(X_train, y_train, mutual_info=score == "mutual_info")
+        for X_train, _, y_train, _ in folds
+    ]
+    selections = {}
+    for k in k_values:
+        if k is None or k >= n_features:
+            selections[n_features] = [np.arange(n_features)] * len(folds)
+        else:
+            selections[k] = [np.flatnonzero(s.support_k_best(k, score)) for s in stats]
+    return selections
+
+
+# scaled folds and selected columns of every feature set in the worker processes
+_FOLDS, _SELECTIONS = {}, {}
+
+
+def _init_worker(folds: dict, selections: dict, single_thread: bool = True) -> None:
+    global _FOLDS, _SELECTIONS
+    _FOLDS, _SELECTIONS = folds, selections
+    if torch is not None and single_thread:
+        # one process per core already, more threads only compete with each other
+        torch.set_num_threads(1)
+
+
+def _run_task(task: Tuple[str, int, str, int]) -> Tuple[float, ...]:
+    feature_set, k, name, fold = task
+    X_train, X_test, y_train, y_test = _FOLDS[feature_set][fold]
+    columns = _SELECTIONS[feature_set][k][fold]
+    X_train, X_test = X_train[:, columns], X_test[:, columns]
+    labels = np.unique(np.concatenate([y_train, y_test])).tolist()
+    model = CLASSIFIERS[name](X_train.shape[1], len(labels))
+
+    start_time = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter()
+    y_pred = model.predict(X_test)
+    predict_time = time.perf_counter()
+    return assess(y_test, y_pred, labels) + (fit_time - start_time, predict_time - fit_time)
+
+
+def run_benchmark(
+    feature_sets: Dict[str, Tuple[pd.DataFrame, np.ndarray]],
+    classifiers: List[str] = None,
+    n_splits: int = 5,
+    workers: int = None,
+    k_values: List[int] = None,
+    score: str = "f",
+) -> pd.DataFrame:
+    """
+    Cross validate the classifiers on every feature set given as name -> (X, y) and on
+    the k best features of it for every k of k_values by the given score. Returns one
+    row per feature set, number of features, classifier and fold.
+    """
+    classifiers = classifiers or list(CLASSIFIERS)
+    folds = {
+        name: scaled_folds(np.asarray(X, dtype=float), np.asarray(y), n_splits)
+        for name, (X, y) in feature_sets.items()
+    }
+    selections = {
+        name: fold_selections(set_folds, k_values or [None], score)
+        for name, set_folds in folds.items()
+    }
+    tasks = [
+        (feature_set, k, name, fold)
+        for feature_set in feature_sets
+        for k in selections[feature_set]
+        for name in classifiers
+        for fold in range(n_splits)
+    ]
+
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        _init_worker(folds, selections, single_thread=False)
+        results = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(folds, selections)
+        ) as pool:
+            results = list(pool.map(_run_task, tasks))
+
+    return pd.DataFrame(
+        [task + result for task, result in zip(tasks, results)],
+        columns=["features", "n_features", "classifier", "fold"] + METRICS,
+    )
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mean and standard deviation over the folds, best MCC first
+    """
+    summary = results.groupby(["features", "n_features", "classifier"], sort=False)[METRICS].agg(
+        ["mean", "std"]
+    )
+    return summary.sort_values(by=("MCC", "mean"), ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", nargs="+", default=["features.csv"])
+    parser.add_argument(
+        "--classifiers", nargs="+", choices=list(CLASSIFIERS), help="default all"
+    )
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument(
+        "-k", type=int, nargs="+", help="numbers of best features to select, default all"
+    )
+    parser.add_argument("--score", default="f", choices=["f", "mutual_info"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--data", default="./data")
+    parser.add_argument("--output", default="./data/benchmark_results.csv")
+    args = parser.parse_args()
+
+    feature_sets = {}
+    for filename in args.features:
+        X, y, _ = load_features(os.path.join(args.data, filename))
+        feature_sets[filename] = (X, y)
+
+    start_time = time.perf_counter()
+    results = run_benchmark(
+        feature_sets, args.classifiers, args.folds, args.workers, args.k, args.score
+    )
+    print(f"Benchmark finished in {round(time.perf_counter() - start_time, 2)}sec")
+
+    results.to_csv(args.output, index=False)
+    summary = summarize(results)
+    summary.to_csv(os.path.splitext(args.output)[0] + "_summary.csv")
+    print(summary.round(decimals=3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Feature selection from cached per feature class statistics
+
+The class counts, means and variances of every feature are computed once. The
+variances and ANOVA F scores follow from them, so selections for any k or threshold
+are array lookups. Statistics and feature matrices are cached as uncompressed .npz files
+with one array per column, reading a subset of columns only reads those arrays.
+"""
+import os
+import numpy as np
+import pandas as pd
+from scipy.stats import f as f_distribution
+from sklearn.feature_selection import mutual_info_classif
+from typing import List, Tuple
+
+from util.encoding import encode
+
+# columns of the feature files which are not features
+NON_FEATURES = ["Unnamed: 0", "name", "filename", "length", "label"]
+SCORES = ["f", "mutual_info", "variance"]
+COLUMNS_KEY = "__columns__"
+
+
+class FeatureStatistics:
+    """
+    Class counts (classes,) and per class means and variances (classes, features)
+    """
+
+    def __init__(
+        self,
+        features: np.ndarray,
+        classes: np.ndarray,
+        counts: np.ndarray,
+        class_means: np.ndarray,
+        class_vars: np.ndarray,
+        mutual_info: np.ndarray = None,
+    ):
+        self.features = features
+        self.classes = classes
+        self.counts = counts
+        self.class_means = class_means
+        self.class_vars = class_vars
+        self.mutual_info = mutual_info
+
+        n_samples = counts.sum()
+        weights = counts[:, None] / n_samples
+        self.mean = (weights * class_means).sum(axis=0)
+        # law of total variance, within plus between the classes
+        within = (counts[:, None] * class_vars).sum(axis=0)
+        between = (counts[:, None] * (class_means - self.mean) ** 2).sum(axis=0)
+        self.variance = (within + between) / n_samples
+
+        # ANOVA F, ratio of the mean squares between and within the classes
+        df_between, df_within = len(classes) - 1, n_samples - len(classes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.f_scores = (between / df_between) / (within / df_within)
+        self.p_values = f_distribution.sf(self.f_scores, df_between, df_within)
+
+    @classmethod
+    def fit(
+        cls, X, y, feature_names: List[str] = None, mutual_info: bool = True
+    ) -> "FeatureStatistics":
+        """
+        Statistics of a feature matrix or data frame X with labels y, the mutual
+        information is estimated with nearest neighbors and the slowest part by far
+        """
+        if feature_names is None:
+            feature_names = X.columns if isinstance(X, pd.DataFrame) else range(X.shape[1])
+        X = np.asarray(X, dtype=float)
+        classes, y_codes, counts = np.unique(y, return_inverse=True, return_counts=True)
+
+        # per class sums in one matrix product each, the variances from the deviations
+        # of the class means since E[x^2] - E[x]^2 cancels for large means
+        onehot = np.zeros((len(classes), len(X)))
+        onehot[y_codes, np.arange(len(X))] = 1.0
+        class_means = onehot @ X / counts[:, None]
+        class_vars = onehot @ (X - class_means[y_codes]) ** 2 / counts[:, None]
+
+        return cls(
+            np.asarray(feature_names, dtype=str),
+            classes,
+            counts,
+            class_means,
+            class_vars,
+            mutual_info_classif(X, y_codes, random_state=42) if mutual_info else None,
+        )
+
+    def scores(self, score: str = "f") -> np.ndarray:
+        if score not in SCORES:
+            raise ValueError(f"Invalid score: {score}")
+        if score == "mutual_info" and self.mutual_info is None:
+            raise ValueError("Mutual information was not computed")
+        scores = {"f": self.f_scores, "mutual_info": self.mutual_info, "variance": self.variance}
+        return scores[score]
+
+    def support_k_best(self, k: int, score: str = "f") -> np.ndarray:
+        """
+        Boolean mask of the k features with the highest scores, like SelectKBest
+        """
+        # missing scores of constant features are never selected first
+        scores = np.nan_to_num(self.scores(score), nan=-np.inf)
+        support = np.zeros(len(self.features), dtype=bool)
+        if k > 0:
+            support[np.argsort(scores, kind="mergesort")[-k:]] = True
+        return support
+
+    def support_threshold(self, threshold: float, score: str = "variance") -> np.ndarray:
+        """
+        Boolean mask of the features scoring above threshold, like VarianceThreshold
+        """
+        return self.scores(score) > threshold
+
+    def k_best(self, k: int, score: str = "f") -> List[str]:
+        return self.features[self.support_k_best(k, score)].tolist()
+
+    def above(self, threshold: float, score: str = "variance") -> List[str]:
+        return self.features[self.support_threshold(threshold, score)].tolist()
+
+    def save(self, filepath: str) -> None:
+        np.savez(
+            filepath,
+            features=self.features,
+            classes=self.classes,
+            counts=self.counts,
+            class_means=self.class_means,
+            class_vars=self.class_vars,
+            mutual_info=self.mutual_info if self.mutual_info is not None else np.zeros(0),
+        )
+
+    @classmethod
+    def load(cls, filepath: str) -> "FeatureStatistics":
+        with np.load(filepath, allow_pickle=False) as data:
+            mutual_info = data["mutual_info"]
+            return cls(
+                data["features"],
+                data["classes"],
+                data["counts"],
+                data["class_means"],
+                data["class_vars"],
+                mutual_info if len(mutual_info) else None,
+            )
+
+
+def write_columns(df: pd.DataFrame, filepath: str) -> None:
+    """
+    Store every column of a data frame as its own array of an uncompressed .npz file
+    """
+    arrays = {COLUMNS_KEY: np.asarray(df.columns, dtype=str)}
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        # text columns as fixed width unicode, so loading never needs to unpickle
+        arrays[f"column_{i}"] = values.astype(str) if values.dtype == object else values
+    np.savez(filepath, **arrays)
+
+
+def read_columns(filepath: str, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Read all or only the given columns of a file written by write_columns
+    """
+    with np.load(filepath, allow_pickle=False) as data:
+        names = data[COLUMNS_KEY].tolist()
+        positions = {name: i for i, name in enumerate(names)}
+        columns = names if columns is None else columns
+        return pd.DataFrame({col: data[f"column_{positions[col]}"] for col in columns})
+
+
+def _cache_path(filepath: str, cache_dir: str, suffix: str) -> Tuple[str, bool]:
+    """
+    Path of the cache file of a feature file and whether it is newer than the file
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(filepath), "cache")
+    path = os.path.join(cache_dir, os.path.basename(filepath) + suffix)
+    fresh = os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(filepath)
+    return path, fresh
+
+
+def read_features(filepath: str, cache_dir: str = None) -> pd.DataFrame:
+    """
+    Read a feature csv file from its columnar cache, create the cache if it is missing
+    or older than the csv file. Files written by write_columns are read directly.
+    """
+    if filepath.endswith(".npz"):
+        return read_columns(filepath)
+    path, fresh = _cache_path(filepath, cache_dir, ".npz")
+    if fresh:
+        return read_columns(path)
+    df = pd.read_csv(filepath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_columns(df, path)
+    return df
+
+
+def load_features(filepath: str, cache_dir: str = None) -> Tuple[pd.DataFrame, np.ndarray, dict]:
+    """
+    Features, integer labels and label map of a feature file
+    """
+    df = read_features(filepath, cache_dir)
+    X = df.drop(columns=[col for col in NON_FEATURES if col in df.columns])
+    y, code = encode(df["label"])
+    return X, y, code
+
+
+def load_statistics(filepath: str, cache_dir: str = None) -> FeatureStatistics:
+    """
+    Statistics of a feature file from the cache, computed and cached like read_features
+    """
+    path, fresh = _cache_path(filepath, cache_dir, ".stats.npz")
+    if fresh:
+        return FeatureStatistics.load(path)
+    X, y, _ = load_features(filepath, cache_dir)
+    stats = FeatureStatistics.fit(X, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stats.save(path)
+    return stats
@@ -4,16 +4,118 @@ Helper functions to encode and decode string labels to integers
 import numpy as np
 
 
-def encode(y):
-    labels = y.unique()
-    # encode label map
-    code = {v: i for i, v in enumerate(labels)}
+class LabelCodec:
+    """
+    Maps string labels to consecutive integer codes and back.
+
+    The codec is fit once on the training labels. Encoding is a vectorized
+    binary search into the sorted label array and decoding is a single array
+    index, so both scale to millions of predictions.
+
+    handle_unknown decides what happens with labels/codes the codec has not
+    seen while fitting:
+      "error"  raise a ValueError
+      "ignore" map them to unknown_value (encode) or unknown_label (decode)
+    """
+
+    def __init__(self, handle_unknown="error", unknown_value=-1, unknown_label=None):
+        if handle_unknown not in ("error", "ignore"):
+            raise ValueError(f"Invalid unknown label policy: {handle_unknown}")
+        self.handle_unknown = handle_unknown
+        self.unknown_value = unknown_value
+        self.unknown_label = unknown_label
+        self.classes_ = None
+
+    def fit(self, y):
+        self.classes_ = np.unique(np.asarray(y))
+        return self
+
+    def fit_transform(self, y):
+        self.classes_, codes = np.unique(np.asarray(y), return_inverse=True)
+        return codes.reshape(-1)
+
+    def transform(self, y):
+        self._check_fitted()
+        y = np.asarray(y)
+        idx = np.searchsorted(self.classes_, y)
+        # searchsorted returns len(classes_) for labels after the last class
+        idx_clipped = np.minimum(idx, len(self.classes_) - 1)
+        known = self.classes_[idx_clipped] == y
+        if known.all():
+            return idx
+        if self.handle_unknown == "error":
+            raise ValueError(f"Unseen labels: {np.unique(y[~known])}")
+        return np.where(known, idx, self.unknown_value)
 
-    # encode labels to new vector
-    return np.array(list(map(lambda x: code[x], y))), code
+    def inverse_transform(self, codes):
+        self._check_fitted()
+        codes = np.asarray(codes, dtype=np.int64)
+        known = (codes >= 0) & (codes < len(self.classes_))
+        if known.all():
+            return self.classes_[codes]
+        if self.handle_unknown == "error":
+            raise ValueError(f"Unseen codes: {np.unique(codes[~known])}")
+        labels = self.classes_[np.where(known, codes, 0)].astype(object)
+        labels[~known] = self.unknown_label
+        return labels
+
+    @property
+    def code(self):
+        """
+        Label map in the same format as returned by encode
+        """
+        self._check_fitted()
+        return {v: i for i, v in enumerate(self.classes_.tolist())}
+
+    def save(self, path):
+        """
+        Store the codec as .npz file, e.g. next to the saved model
+        """
+        self._check_fitted()
+        # numbers keep their dtype and sort order, only object arrays become strings
+        # since loading them would need unpickling
+        classes = self.classes_
+        if classes.dtype == object:
+            classes = classes.astype(str)
+        # an empty array stands for no unknown label
+        unknown_label = np.asarray(
+            [] if self.unknown_label is None else [self.unknown_label]
+        )
+        if unknown_label.dtype == object:
+            unknown_label = unknown_label.astype(str)
+        np.savez(
+            path,
+            classes=classes,
+            handle_unknown=self.handle_unknown,
+            unknown_value=self.unknown_value,
+            unknown_label=unknown_label,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            unknown_label = data["unknown_label"].tolist()
+            codec = cls(
+                handle_unknown=str(data["handle_unknown"]),
+                unknown_value=int(data["unknown_value"]),
+                unknown_label=unknown_label[0] if unknown_label else None,
+            )
+            codec.classes_ = data["classes"]
+        return codec
+
+    def _check_fitted(self):
+        if self.classes_ is None:
+            raise ValueError("LabelCodec is not fitted yet")
+
+
+def encode(y):
+    codec = LabelCodec()
+    # encode labels to new vector and label map
+    return codec.fit_transform(y), codec.code
 
 
 def decode(y, code):
-    keys = list(code.keys())
-    values = list(code.values())
-    return np.array(list(map(lambda x: keys[values.index(x)], y)))
+    # labels are stored at the position of their code
+    labels = np.empty(len(code), dtype=object)
+    labels[list(code.values())] = list(code.keys())
+    return labels[np.asarray(y, dtype=np.int64)]